@@ -2,19 +2,123 @@
 """
 SQLite Database Backup Script
 Creates timestamped backups of invoices.db
+
+Usage:
+    python backup_database.py            # Consistent page-by-page backup
+    python backup_database.py --compact  # Defragmented backup via VACUUM INTO
 """
+import heapq
 import shutil
 import os
+import sqlite3
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
-def backup_database():
+# Online Backup API step size: copy 1000 pages per step, then sleep 5 ms so
+# writers on the live database are not starved
+BACKUP_STEP_PAGES = 1000
+BACKUP_STEP_SLEEP = 0.005
+
+# VACUUM INTO was added in SQLite 3.27
+VACUUM_INTO_MIN_VERSION = (3, 27, 0)
+
+# Buffer size for the raw file-copy fallback (1 MiB)
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Stat backup files in parallel once the directory holds more than this many
+# backups (e.g. hundreds of snapshots on a network share)
+PARALLEL_STAT_THRESHOLD = 64
+STAT_WORKERS = 16
+
+def backup_sizes(entries):
+    """Return file sizes in bytes for the given DirEntry objects"""
+    with ThreadPoolExecutor(max_workers=STAT_WORKERS) as executor:
+        return list(executor.map(lambda entry: entry.stat().st_size, entries))
+
+def copy_file(src_path, dst_path):
+    """Copy a file with a 1 MiB buffer, preserving its metadata.
+
+    On Linux ``os.copy_file_range`` is tried first so the kernel can copy
+    (or reflink) the data without it passing through userspace.
+    Returns the size of the copy in bytes.
+    """
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        src_size = os.fstat(src.fileno()).st_size
+        copied = False
+        if hasattr(os, 'copy_file_range'):
+            try:
+                size = src_size
+                while size > 0:
+                    sent = os.copy_file_range(src.fileno(), dst.fileno(), size)
+                    if sent == 0:
+                        break
+                    size -= sent
+                copied = size == 0
+            except OSError:
+                copied = False
+            if not copied:
+                # Restart from scratch with the buffered copy
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+        if not copied:
+            shutil.copyfileobj(src, dst, length=COPY_BUFFER_SIZE)
+        # fstat the open descriptor rather than stat()-ing the path again
+        dst.flush()
+        dst_size = os.fstat(dst.fileno()).st_size
+    shutil.copystat(src_path, dst_path)
+    return dst_size
+
+def copy_database(db_file, backup_file, compact=False):
+    """Copy a SQLite database using the Online Backup API.
+
+    Produces a consistent snapshot even while the bot has the database open.
+    With ``compact=True`` the copy is written with ``VACUUM INTO`` instead,
+    which leaves out free pages (needs SQLite 3.27+, otherwise the backup API
+    is used). Falls back to a plain file copy if the source cannot be opened
+    as SQLite. Returns the size of the backup in bytes.
+    """
+    # connect() opens lazily, so read the schema version to find out whether
+    # the file is actually usable as a SQLite database
+    src = None
+    try:
+        src = sqlite3.connect(f"{Path(db_file).resolve().as_uri()}?mode=ro", uri=True)
+        src.execute("PRAGMA schema_version").fetchone()
+    except sqlite3.DatabaseError:
+        # Database is offline, corrupt or not SQLite - copy the file as-is
+        if src is not None:
+            src.close()
+        return copy_file(db_file, backup_file)
+
+    dst = None
+    try:
+        if compact and sqlite3.sqlite_version_info >= VACUUM_INTO_MIN_VERSION:
+            src.execute("VACUUM INTO ?", (str(backup_file),))
+            return os.stat(backup_file).st_size
+
+        dst = sqlite3.connect(str(backup_file))
+        src.backup(dst, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP)
+        # The backup file is exactly page_count pages long - no need to stat it
+        page_count = dst.execute("PRAGMA page_count").fetchone()[0]
+        page_size = dst.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+    finally:
+        if dst is not None:
+            dst.close()
+        src.close()
+
+def backup_database(compact=False):
     """Create a timestamped backup of the database"""
     
     # Database file
     db_file = Path('database') / 'invoices.db'
     
-    if not db_file.exists():
+    try:
+        db_stat = db_file.stat()
+    except FileNotFoundError:
         print("❌ Database file 'database/invoices.db' not found")
         return False
     
@@ -27,12 +131,23 @@ def backup_database():
     backup_file = backup_dir / f'invoices_{timestamp}.db'
     
     try:
-        # Copy database
-        shutil.copy2(db_file, backup_file)
+        # Copy into a temporary file in the same directory, then rename it into
+        # place so an interrupted backup never leaves a truncated .db behind
+        tmp = tempfile.NamedTemporaryFile(dir=backup_dir, prefix='.invoices_', suffix='.tmp', delete=False)
+        tmp.close()
+        try:
+            backup_bytes = copy_database(db_file, tmp.name, compact=compact)
+            os.replace(tmp.name, backup_file)
+        except BaseException:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+            raise
+        if os.name == 'posix':
+            os.chmod(backup_file, 0o600)
         
         # Get file sizes
-        original_size = db_file.stat().st_size / 1024  # KB
-        backup_size = backup_file.stat().st_size / 1024  # KB
+        original_size = db_stat.st_size / 1024  # KB
+        backup_size = backup_bytes / 1024  # KB
         
         print("=" * 70)
         print("✅ DATABASE BACKUP SUCCESSFUL!")
@@ -45,13 +160,23 @@ def backup_database():
         print("=" * 70)
         
         # List all backups
-        backups = sorted(backup_dir.glob('invoices_*.db'))
+        with os.scandir(backup_dir) as it:
+            backups = [
+                entry for entry in it
+                if entry.name.startswith('invoices_') and entry.name.endswith('.db')
+            ]
         if len(backups) > 1:
             print(f"\n📚 Total backups: {len(backups)}")
             print("   Recent backups:")
-            for backup in backups[-5:]:  # Show last 5
-                size = backup.stat().st_size / 1024
-                print(f"   - {backup.name} ({size:.2f} KB)")
+            # Show last 5 (only these are stat'ed); a 5-element heap avoids
+            # sorting the whole directory listing
+            recent = heapq.nlargest(5, backups, key=lambda entry: entry.name)[::-1]
+            if len(backups) > PARALLEL_STAT_THRESHOLD:
+                sizes = backup_sizes(recent)
+            else:
+                sizes = [backup.stat().st_size for backup in recent]
+            for backup, size in zip(recent, sizes):
+                print(f"   - {backup.name} ({size / 1024:.2f} KB)")
         
         return True
     
@@ -61,7 +186,7 @@ def backup_database():
 
 if __name__ == "__main__":
     print("\n🔄 Starting database backup...")
-    success = backup_database()
+    success = backup_database(compact='--compact' in sys.argv[1:])
     
     if success:
         print("\n💡 Tip: Run this script regularly to keep backups!")
@@ -2,28 +2,62 @@
 Database inspection and validation script
 Compares database contents with the visualization
 """
+import argparse
 import sys
 import os
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, create_engine, event, func
+from sqlalchemy.orm import selectinload, sessionmaker
 
 # Add project root to path
 project_root = Path(__file__).parent
 sys.path.append(str(project_root))
 
-from src.database import get_db_session, Invoice, InvoiceItem  # noqa: E402
+from src.database import get_db_session, is_supabase, Invoice, InvoiceItem  # noqa: E402
+
+# Inspection runs several scans; read pages through mmap and keep them in a
+# 64 MB page cache so later queries don't go back to disk
+READ_PRAGMAS = (
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+)
+
+def get_readonly_session(db_path):
+    """Open a read-only session on the SQLite database (never takes a write lock)"""
+    engine = create_engine(f"sqlite:///{Path(db_path).resolve().as_uri()}?mode=ro&uri=true")
+    
+    @event.listens_for(engine, "connect")
+    def _set_read_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in READ_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+    
+    Session = sessionmaker(bind=engine)
+    return Session()
+
+# (threshold, divisor, format spec, suffix) - checked from the largest threshold down
+_CURRENCY_BUCKETS = (
+    (1_000_000, 1_000_000, '.1f', 'M'),
+    (1_000, 1_000, '.0f', 'K'),
+    (float('-inf'), 1, ',.0f', ''),
+)
 
 def format_currency(amount):
     """Format amount as Indonesian Rupiah"""
-    if amount >= 1_000_000:
-        return f"Rp {amount/1_000_000:.1f}M"
-    elif amount >= 1_000:
-        return f"Rp {amount/1_000:.0f}K"
-    else:
-        return f"Rp {amount:,.0f}"
+    for threshold, divisor, spec, suffix in _CURRENCY_BUCKETS:
+        if amount >= threshold:
+            return f"Rp {amount / divisor:{spec}}{suffix}"
 
-def check_database():
-    """Check database contents and compare with visualization"""
+def check_database(details=False):
+    """Check database contents and compare with visualization.
+
+    Args:
+        details: Also print every invoice with its items
+    """
     print("=" * 70)
     print("DATABASE INSPECTION & VALIDATION")
     print("=" * 70)
@@ -34,21 +68,38 @@ def check_database():
     db_path = get_default_db_path()
     print(f"📁 Database Location: {db_path}")
     
-    if not os.path.exists(db_path):
+    try:
+        file_size = os.stat(db_path).st_size
+    except FileNotFoundError:
         print("❌ Database file does not exist!")
         return
     
-    # Get file size
-    file_size = os.path.getsize(db_path)
     print(f"📊 Database Size: {file_size:,} bytes ({file_size/1024:.2f} KB)")
     print()
     
-    # Get session
-    session = get_db_session()
-    
-    # Count records
-    total_invoices = session.query(Invoice).count()
-    total_items = session.query(InvoiceItem).count()
+    # Get session - inspection only reads, so open SQLite in read-only mode
+    session = get_db_session() if is_supabase() else get_readonly_session(db_path)
+    
+    # Count records, totals and the invoice date range in one pass over invoices.
+    # ISO-8601 date strings compare lexicographically, so SQLite can find the
+    # range and count recent invoices without parsing every date in Python.
+    # An invoice dated D counts as "within 8 weeks" when midnight of D is at
+    # or after now - 8 weeks, i.e. when D is later than the cutoff's date.
+    # MIN/MAX/COUNT skip NULL dates, and NULL > cutoff falls to the ELSE branch.
+    cutoff = (datetime.now() - timedelta(weeks=8)).strftime('%Y-%m-%d')
+    (
+        total_invoices, total_amount_sum, avg_amount_value,
+        oldest_str, newest_str, dated_count, in_range_count,
+    ) = session.query(
+        func.count(Invoice.id),
+        func.sum(Invoice.total_amount),
+        func.avg(Invoice.total_amount),
+        func.min(Invoice.invoice_date),
+        func.max(Invoice.invoice_date),
+        func.count(Invoice.invoice_date),
+        func.sum(case((Invoice.invoice_date > cutoff, 1), else_=0)),
+    ).one()
+    total_items = session.query(func.count(InvoiceItem.id)).scalar()
     
     print("=" * 70)
     print("BASIC STATISTICS")
@@ -62,12 +113,9 @@ def check_database():
         session.close()
         return
     
-    # Get all invoices
-    invoices = session.query(Invoice).order_by(Invoice.processed_at.desc()).all()
-    
-    # Calculate totals - SQLAlchemy returns actual float values at runtime
-    total_spent: float = sum(float(inv.total_amount) for inv in invoices)  # type: ignore[arg-type]
-    avg_amount: float = total_spent / len(invoices) if invoices else 0.0
+    # Totals come from the aggregate query (Numeric on Supabase, so coerce to float)
+    total_spent: float = float(total_amount_sum or 0)
+    avg_amount: float = float(avg_amount_value or 0)
     
     print("=" * 70)
     print("FINANCIAL SUMMARY")
@@ -130,16 +178,15 @@ def check_database():
         "Cafe futur": 0.0e6,      # Rp 0.0M (shown but minimal)
     }
     
-    # Get actual vendors
-    from collections import defaultdict
-    vendor_totals: dict[str, float] = defaultdict(float)
-    for inv in invoices:
-        # Type ignore for SQLAlchemy column access - returns str at runtime
-        vendor_name = str(inv.shop_name) if inv.shop_name is not None else ""  # type: ignore[arg-type]
-        vendor_totals[vendor_name] += float(inv.total_amount)  # type: ignore[arg-type]
-    
-    # Sort by amount
-    sorted_vendors = sorted(vendor_totals.items(), key=lambda x: x[1], reverse=True)
+    # Get actual vendors, grouped and sorted by amount in SQL
+    vendor_total = func.sum(Invoice.total_amount)
+    sorted_vendors = [
+        (vendor_name or "", float(amount or 0))
+        for vendor_name, amount in session.query(Invoice.shop_name, vendor_total)
+        .group_by(Invoice.shop_name)
+        .order_by(vendor_total.desc())
+        .all()
+    ]
     
     print("\nExpected (from image):")
     for vendor, amount in expected_vendors.items():
@@ -162,45 +209,58 @@ def check_database():
             print(f"   Actual:   {actual_top}")
     
     print()
-    print("=" * 70)
-    print("DETAILED INVOICE LIST")
-    print("=" * 70)
-    print()
-    
-    for i, inv in enumerate(invoices, 1):
-        print(f"#{i} - ID: {inv.id}")
-        print(f"   📅 Date: {inv.invoice_date or 'Unknown'}")
-        print(f"   🏢 Vendor: {inv.shop_name}")
-        print(f"   💰 Amount: {format_currency(inv.total_amount)} (Rp {inv.total_amount:,.2f})")
-        print(f"   🔖 Type: {inv.transaction_type or 'Unknown'}")
-        print(f"   📸 Image: {inv.image_path or 'None'}")
-        print(f"   ⏰ Processed: {inv.processed_at}")
-        
-        # Show items
-        if inv.items:
-            print(f"   📦 Items ({len(inv.items)}):")
-            for item in inv.items:
-                item_detail = f"      • {item.item_name}: {format_currency(item.total_price)}"
-                if item.quantity:
-                    item_detail += f" ({item.quantity}x"
-                    if item.unit_price:
-                        item_detail += f" @ {format_currency(item.unit_price)}"
-                    item_detail += ")"
-                print(item_detail)
+    # Per-invoice details can run to thousands of lines - only print on request
+    if details:
+        print("=" * 70)
+        print("DETAILED INVOICE LIST")
+        print("=" * 70)
         print()
+        
+        # Stream invoices in batches of 500; each batch loads its items in one
+        # extra query instead of one per invoice
+        invoices = (
+            session.query(Invoice)
+            .options(selectinload(Invoice.items))
+            .order_by(Invoice.processed_at.desc())
+            .yield_per(500)
+        )
+        
+        # Build each invoice block as one string and write it in a single call
+        for i, inv in enumerate(invoices, 1):
+            lines = [
+                f"#{i} - ID: {inv.id}",
+                f"   📅 Date: {inv.invoice_date or 'Unknown'}",
+                f"   🏢 Vendor: {inv.shop_name}",
+                f"   💰 Amount: {format_currency(inv.total_amount)} (Rp {inv.total_amount:,.2f})",
+                f"   🔖 Type: {inv.transaction_type or 'Unknown'}",
+                f"   📸 Image: {inv.image_path or 'None'}",
+                f"   ⏰ Processed: {inv.processed_at}",
+            ]
+        
+            # Show items
+            if inv.items:
+                lines.append(f"   📦 Items ({len(inv.items)}):")
+                for item in inv.items:
+                    item_detail = f"      • {item.item_name}: {format_currency(item.total_price)}"
+                    if item.quantity:
+                        item_detail += f" ({item.quantity}x"
+                        if item.unit_price:
+                            item_detail += f" @ {format_currency(item.unit_price)}"
+                        item_detail += ")"
+                    lines.append(item_detail)
+            lines.append("")
+            sys.stdout.write("\n".join(lines) + "\n")
     
     # Date range analysis
     print("=" * 70)
     print("DATE RANGE ANALYSIS")
     print("=" * 70)
     
-    # Type ignore for SQLAlchemy column access - returns str | None at runtime
-    dates_with_data = [inv for inv in invoices if inv.invoice_date is not None]  # type: ignore[arg-type]
-    if dates_with_data:
+    # Date range figures come from the aggregate query at the top
+    if dated_count:
         try:
-            invoice_dates = [datetime.strptime(str(inv.invoice_date), "%Y-%m-%d") for inv in dates_with_data]  # type: ignore[arg-type]
-            oldest = min(invoice_dates)
-            newest = max(invoice_dates)
+            oldest = date.fromisoformat(str(oldest_str))
+            newest = date.fromisoformat(str(newest_str))
             date_range = (newest - oldest).days
             
             print("📅 Date Range:")
@@ -209,12 +269,11 @@ def check_database():
             print(f"   Span: {date_range} days")
             
             # Check if within last 8 weeks (56 days)
-            weeks_8_ago = datetime.now() - timedelta(weeks=8)
-            in_range = [d for d in invoice_dates if d >= weeks_8_ago]
-            print(f"\n   Within Last 8 Weeks: {len(in_range)}/{len(invoice_dates)} invoices")
+            in_range_count = in_range_count or 0
+            print(f"\n   Within Last 8 Weeks: {in_range_count}/{dated_count} invoices")
             
-            if len(in_range) != len(invoice_dates):
-                print(f"   ⚠️  Note: {len(invoice_dates) - len(in_range)} invoice(s) are older than 8 weeks")
+            if in_range_count != dated_count:
+                print(f"   ⚠️  Note: {dated_count - in_range_count} invoice(s) are older than 8 weeks")
         except ValueError as e:
             print(f"⚠️  Could not parse dates: {e}")
     else:
@@ -225,13 +284,19 @@ def check_database():
     print("CATEGORY ANALYSIS")
     print("=" * 70)
     
-    # Category distribution - type ignore for SQLAlchemy column access
-    from collections import Counter
-    categories = Counter(str(inv.transaction_type) for inv in invoices if inv.transaction_type is not None)  # type: ignore[arg-type]
+    # Category distribution, counted in SQL (most common first)
+    type_count = func.count(Invoice.id)
+    categories: dict[str, int] = dict(
+        session.query(Invoice.transaction_type, type_count)
+        .filter(Invoice.transaction_type.isnot(None))
+        .group_by(Invoice.transaction_type)
+        .order_by(type_count.desc())
+        .all()
+    )
     
     if categories:
         print("\nTransaction Types:")
-        for cat, count in categories.most_common():
+        for cat, count in categories.items():
             percentage = (count / total_invoices) * 100
             print(f"  {cat.capitalize()}: {count} ({percentage:.1f}%)")
         
@@ -274,8 +339,13 @@ def check_database():
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Inspect and validate the invoice database")
+    parser.add_argument('--details', action='store_true',
+                        help="print every invoice with its items")
+    args = parser.parse_args()
+    
     try:
-        check_database()
+        check_database(details=args.details)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
@@ -10,12 +10,43 @@ Usage:
     python cleanup.py premium expired      # Delete expired subscriptions
     python cleanup.py premium all          # Delete everything (requires confirmation)
     python cleanup.py premium stats        # Show premium statistics
+
+Requires SQLite 3.35+ (DELETE ... RETURNING, UPDATE ... FROM).
 """
 
 import os
 import sqlite3
 import sys
-from datetime import datetime
+
+# Applied to every connection: WAL + synchronous=NORMAL avoid an fsync per
+# commit, mmap and a 64 MB page cache keep the invoice tables resident for the
+# multi-table scans, and busy_timeout waits for the bot instead of failing
+CONNECTION_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+"""
+
+def open_connection(db_path):
+    """Open a SQLite connection with the cleanup PRAGMAs applied.
+
+    Write transactions start with BEGIN IMMEDIATE, so a cleanup takes the
+    write lock up front instead of failing half-way on a busy database.
+    """
+    conn = sqlite3.connect(db_path, isolation_level='IMMEDIATE')
+    conn.executescript(CONNECTION_PRAGMAS)
+    return conn
+
+def list_tables(conn):
+    """Return the names of the tables in the database, in creation order.
+
+    Cleanup only deletes rows, so main() looks the tables up once and
+    passes the result to the helpers that need it.
+    """
+    return tuple(row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'"))
 
 def get_database_path():
     """Get the correct database path."""
@@ -35,59 +66,39 @@ def check_database_exists():
         print("Database not found: database/invoices.db")
         return None
 
-def show_database_stats(db_path):
-    """Show current database statistics."""
+# Keys of the stats dict returned by show_database_stats, in query order
+STAT_KEYS = ('invoices', 'items', 'spending', 'spending_limits', 'users', 'premium', 'tokens')
+
+def show_database_stats(conn, tables):
+    """Show current database statistics.
+
+    Returns a dict of counts keyed by STAT_KEYS, or None if the database
+    could not be read.
+    """
     try:
-        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
 
-        # Count invoices
-        cursor.execute("SELECT COUNT(*) FROM invoices")
-        invoice_count = cursor.fetchone()[0]
-
-        # Count items
-        cursor.execute("SELECT COUNT(*) FROM invoice_items")
-        item_count = cursor.fetchone()[0]
-
-        # Total spending
-        cursor.execute("SELECT SUM(total_amount) FROM invoices")
-        total_spending = cursor.fetchone()[0] or 0
-
-        # Count spending limits
-        try:
-            cursor.execute("SELECT COUNT(*) FROM spending_limits")
-            spending_limits_count = cursor.fetchone()[0]
-        except sqlite3.OperationalError:
-            spending_limits_count = 0
-
-        # Count premium users
-        try:
-            cursor.execute("SELECT COUNT(*) FROM \"user\"")
-            user_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM premium_data")
-            premium_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM token")
-            token_count = cursor.fetchone()[0]
-        except sqlite3.OperationalError:
-            user_count = premium_count = token_count = 0
-
-        print(f"\nCURRENT DATABASE STATS:")
-        print(f"📊 INVOICES:")
-        print(f"   - Total Invoices: {invoice_count}")
-        print(f"   - Total Items: {item_count}")
-        print(f"   - Total Spending: Rp {total_spending:,.2f}")
-        
-        print(f"\n💰 SPENDING LIMITS:")
-        print(f"   - Users with limits: {spending_limits_count}")
-        
-        print(f"\n💎 PREMIUM:")
-        print(f"   - Total Users: {user_count}")
-        print(f"   - Premium Users: {premium_count}")
-        print(f"   - Tokens: {token_count}")
+        # Optional tables may not exist yet; count them as 0 instead of failing
+        def count_of(table):
+            if table in tables:
+                return f'(SELECT COUNT(*) FROM "{table}")'
+            return "NULL"
+
+        # All counts and the spending total in a single query
+        cursor.execute(f"""
+            SELECT
+                (SELECT COUNT(*) FROM invoices),
+                (SELECT COUNT(*) FROM invoice_items),
+                (SELECT SUM(total_amount) FROM invoices),
+                {count_of('spending_limits')},
+                {count_of('user')},
+                {count_of('premium_data')},
+                {count_of('token')}
+        """)
+        stats = dict(zip(STAT_KEYS, (value or 0 for value in cursor.fetchone())))
+        print_stat_counts(stats)
 
-        if invoice_count > 0:
+        if stats['invoices'] > 0:
             # Show date range
             cursor.execute("SELECT MIN(processed_at), MAX(processed_at) FROM invoices")
             date_range = cursor.fetchone()
@@ -100,112 +111,202 @@ def show_database_stats(db_path):
                 ORDER BY processed_at DESC 
                 LIMIT 5
             """)
-            recent = cursor.fetchall()
 
             print(f"\n📝 RECENT INVOICES:")
-            for id, shop, amount, date in recent:
+            for id, shop, amount, date in cursor:
                 print(f"   - ID {id}: {shop} - Rp {amount:,.2f} ({date})")
 
-        conn.close()
-        return invoice_count, item_count
+        return stats
 
     except Exception as e:
         print(f"Error reading database: {e}")
-        return 0, 0
+        return None
 
-def clean_database(db_path, clean_type):
-    """Clean database based on type."""
+def print_stat_counts(stats):
+    """Print the row counts collected by show_database_stats."""
+    print(f"\nCURRENT DATABASE STATS:")
+    print(f"📊 INVOICES:")
+    print(f"   - Total Invoices: {stats['invoices']}")
+    print(f"   - Total Items: {stats['items']}")
+    print(f"   - Total Spending: Rp {stats['spending']:,.2f}")
+    
+    print(f"\n💰 SPENDING LIMITS:")
+    print(f"   - Users with limits: {stats['spending_limits']}")
+    
+    print(f"\n💎 PREMIUM:")
+    print(f"   - Total Users: {stats['users']}")
+    print(f"   - Premium Users: {stats['premium']}")
+    print(f"   - Tokens: {stats['tokens']}")
+
+def remaining_stats(stats, removed):
+    """Subtract the rows a cleanup removed from the stats taken before it."""
+    remaining = {key: value - removed.get(key, 0) for key, value in stats.items()}
+    if remaining['invoices'] == 0:
+        remaining['spending'] = 0
+    return remaining
+
+# Indexes used by the cleanup queries, keyed by the table they belong to
+CLEANUP_INDEXES = {
+    'invoices': [
+        "CREATE INDEX IF NOT EXISTS idx_invoices_processed_at ON invoices(processed_at)",
+    ],
+    'invoice_items': [
+        "CREATE INDEX IF NOT EXISTS idx_items_invoice_id ON invoice_items(invoice_id)",
+    ],
+    'premium_data': [
+        "CREATE INDEX IF NOT EXISTS idx_premium_expired ON premium_data(expired_at)",
+    ],
+    'user': [
+        'CREATE INDEX IF NOT EXISTS idx_user_premium ON "user"(id) WHERE status_account = \'Premium\'',
+    ],
+    'token': [
+        "CREATE INDEX IF NOT EXISTS idx_token_used ON token(is_used) WHERE is_used = 1",
+    ],
+}
+
+def ensure_indexes(conn, tables):
+    """Create the indexes the cleanup queries rely on (no-op once they exist)."""
     try:
-        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
-
-        if clean_type == "all":
-            print("\n🧹 CLEANING ALL DATA...")
-            cursor.execute("DELETE FROM invoice_items")
-            cursor.execute("DELETE FROM invoices")
-            cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('invoices', 'invoice_items')")
-            print("   ✅ Deleted all invoices and items")
-
-        elif clean_type == "items":
-            print("\n🧹 CLEANING ITEMS ONLY...")
-            cursor.execute("DELETE FROM invoice_items")
-            print("   ✅ Deleted all invoice items")
-
-        elif clean_type == "limits":
-            print("\n🧹 CLEANING SPENDING LIMITS...")
-            try:
-                cursor.execute("DELETE FROM spending_limits")
-                print("   ✅ Deleted all spending limits")
-            except sqlite3.OperationalError:
-                print("   ⚠️  spending_limits table doesn't exist")
-
-        elif clean_type == "everything":
-            print("\n🧹 CLEANING EVERYTHING (invoices + limits, NOT premium)...")
-            # Invoices
-            cursor.execute("DELETE FROM invoice_items")
-            cursor.execute("DELETE FROM invoices")
-            print("   ✅ Deleted all invoices")
+        for table, statements in CLEANUP_INDEXES.items():
+            if table in tables:
+                for statement in statements:
+                    cursor.execute(statement)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"⚠️  Could not create indexes: {e}")
+
+def delete_invoices_where(cursor, condition):
+    """Delete invoices matching condition together with their items.
+
+    The matching ids are collected once into a temp table, so invoices is
+    scanned a single time for both DELETEs. Returns a dict with the number
+    of invoices and items deleted and the spending they accounted for.
+    """
+    # sqlite3 only opens the transaction implicitly before the first DELETE;
+    # take the write lock now so the ids and spending are read under it too
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute(f"CREATE TEMP TABLE _victims AS SELECT id, total_amount FROM invoices WHERE {condition}")
+    try:
+        cursor.execute("SELECT TOTAL(total_amount) FROM _victims")
+        spending = cursor.fetchone()[0]
+        cursor.execute("DELETE FROM invoice_items WHERE invoice_id IN (SELECT id FROM _victims)")
+        items = cursor.rowcount
+        cursor.execute("DELETE FROM invoices WHERE id IN (SELECT id FROM _victims)")
+        return {'invoices': cursor.rowcount, 'items': items, 'spending': spending}
+    finally:
+        cursor.execute("DROP TABLE _victims")
+
+def clean_database(conn, clean_type):
+    """Clean database based on type.
+
+    Returns the number of rows removed, keyed like the show_database_stats
+    dict, so the final statistics need not be queried again.
+    """
+    removed = {}
+    if clean_type in ("old", "test"):
+        # Only the conditional deletes look rows up through the indexes
+        ensure_indexes(conn, ('invoices', 'invoice_items'))
+    try:
+        with conn:
+            cursor = conn.cursor()
+
+            if clean_type == "all":
+                print("\n🧹 CLEANING ALL DATA...")
+                cursor.execute("DELETE FROM invoice_items")
+                removed['items'] = cursor.rowcount
+                cursor.execute("DELETE FROM invoices")
+                removed['invoices'] = cursor.rowcount
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('invoices', 'invoice_items')")
+                print("   ✅ Deleted all invoices and items")
+
+            elif clean_type == "items":
+                print("\n🧹 CLEANING ITEMS ONLY...")
+                cursor.execute("DELETE FROM invoice_items")
+                removed['items'] = cursor.rowcount
+                print("   ✅ Deleted all invoice items")
+
+            elif clean_type == "limits":
+                print("\n🧹 CLEANING SPENDING LIMITS...")
+                try:
+                    cursor.execute("DELETE FROM spending_limits")
+                    removed['spending_limits'] = cursor.rowcount
+                    print("   ✅ Deleted all spending limits")
+                except sqlite3.OperationalError:
+                    print("   ⚠️  spending_limits table doesn't exist")
+
+            elif clean_type == "everything":
+                print("\n🧹 CLEANING EVERYTHING (invoices + limits, NOT premium)...")
+                # Invoices
+                cursor.execute("DELETE FROM invoice_items")
+                removed['items'] = cursor.rowcount
+                cursor.execute("DELETE FROM invoices")
+                removed['invoices'] = cursor.rowcount
+                print("   ✅ Deleted all invoices")
             
-            # Spending limits
-            try:
-                cursor.execute("DELETE FROM spending_limits")
-                print("   ✅ Deleted spending limits")
-            except sqlite3.OperationalError:
-                pass
+                # Spending limits
+                try:
+                    cursor.execute("DELETE FROM spending_limits")
+                    removed['spending_limits'] = cursor.rowcount
+                    print("   ✅ Deleted spending limits")
+                except sqlite3.OperationalError:
+                    pass
             
-            # Reset sequences
-            cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('invoices', 'invoice_items', 'spending_limits')")
-            print("   ✅ Reset auto-increment counters")
-            print("\n💡 Note: Premium tables not affected. Use cleanup_premium.py for that.")
-
-        elif clean_type == "old":
-            print("\n🧹 CLEANING OLD DATA (7+ days)...")
-            cursor.execute("""
-                DELETE FROM invoice_items 
-                WHERE invoice_id IN (
-                    SELECT id FROM invoices 
-                    WHERE processed_at < datetime('now', '-7 days')
-                )
-            """)
-            cursor.execute("DELETE FROM invoices WHERE processed_at < datetime('now', '-7 days')")
-            deleted = cursor.rowcount
-            print(f"   ✅ Deleted {deleted} old invoices")
+                # Reset sequences
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('invoices', 'invoice_items', 'spending_limits')")
+                print("   ✅ Reset auto-increment counters")
+                print("\n💡 Note: Premium tables not affected. Use cleanup_premium.py for that.")
+
+            elif clean_type == "old":
+                print("\n🧹 CLEANING OLD DATA (7+ days)...")
+                removed = delete_invoices_where(cursor, "processed_at < datetime('now', '-7 days')")
+                print(f"   ✅ Deleted {removed['invoices']} old invoices")
+
+            elif clean_type == "test":
+                print("\n🧹 CLEANING TEST DATA...")
+                # LIKE is case-insensitive for ASCII, so one pattern covers test/Test/TEST
+                removed = delete_invoices_where(cursor, "shop_name LIKE '%test%'")
+                print(f"   ✅ Deleted {removed['invoices']} test invoices")
 
-        elif clean_type == "test":
-            print("\n🧹 CLEANING TEST DATA...")
-            cursor.execute("""
-                DELETE FROM invoice_items 
-                WHERE invoice_id IN (
-                    SELECT id FROM invoices 
-                    WHERE shop_name LIKE '%test%' OR shop_name LIKE '%Test%'
-                )
-            """)
-            cursor.execute("DELETE FROM invoices WHERE shop_name LIKE '%test%' OR shop_name LIKE '%Test%'")
-            deleted = cursor.rowcount
-            print(f"   ✅ Deleted {deleted} test invoices")
-
-        conn.commit()
-        conn.close()
         print("\n✅ Database cleaned successfully!")
+        return removed
 
     except Exception as e:
         print(f"\n❌ Error cleaning database: {e}")
+        return {}
 
-def vacuum_database(db_path):
-    """Vacuum database to reclaim space."""
+# Minimum free space (10 MB) before an automatic post-cleanup VACUUM runs
+VACUUM_MIN_FREE_BYTES = 10_000_000
+
+def vacuum_database(conn, force=False):
+    """Vacuum database to reclaim space.
+
+    VACUUM rewrites the whole file, so after a cleanup it only runs once
+    at least VACUUM_MIN_FREE_BYTES are sitting on the freelist. Pass
+    force=True for an explicit vacuum request.
+    """
     try:
+        if not force:
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            free_bytes = free_pages * page_size
+            if free_bytes < VACUUM_MIN_FREE_BYTES:
+                print(f"\n⏭️  Skipping VACUUM: only {free_bytes / 1024:.0f} KB reclaimable")
+                return
         print("\n🔄 VACUUMING DATABASE...")
-        conn = sqlite3.connect(db_path)
+        # VACUUM cannot run inside a transaction
+        conn.commit()
         conn.execute("VACUUM")
-        conn.close()
         print("✅ Database vacuumed successfully!")
     except Exception as e:
         print(f"❌ Error vacuuming database: {e}")
 
-def show_premium_stats(db_path):
+PREMIUM_TABLES = ('user', 'premium_data', 'token')
+
+def show_premium_stats(conn, tables):
     """Show premium-related statistics."""
     try:
-        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
 
         print("\n" + "="*70)
@@ -213,30 +314,23 @@ def show_premium_stats(db_path):
         print("="*70)
 
         # Check if tables exist
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name IN ('user', 'premium_data', 'token')
-        """)
-        existing_tables = [row[0] for row in cursor.fetchall()]
+        existing_tables = [name for name in tables if name in PREMIUM_TABLES]
 
         if not existing_tables:
             print("\n⚠️  No premium tables found in database")
             print("   Premium tables may not have been created yet")
-            conn.close()
             return False
 
         print(f"\n📊 Found tables: {', '.join(existing_tables)}")
 
         # Count users
         if 'user' in existing_tables:
-            cursor.execute('SELECT COUNT(*) FROM "user"')
-            user_count = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT COUNT(*) FROM "user" WHERE status_account = ?', ('Premium',))
-            premium_count = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT COUNT(*) FROM "user" WHERE status_account = ?', ('Free',))
-            free_count = cursor.fetchone()[0]
+            # One scan for the total and the per-status counts
+            cursor.execute('SELECT status_account, COUNT(*) FROM "user" GROUP BY status_account')
+            status_counts = dict(cursor)
+            user_count = sum(status_counts.values())
+            premium_count = status_counts.get('Premium', 0)
+            free_count = status_counts.get('Free', 0)
             
             print(f"\n👥 USERS:")
             print(f"   Total Users: {user_count}")
@@ -245,9 +339,8 @@ def show_premium_stats(db_path):
 
             if user_count > 0 and user_count <= 5:
                 cursor.execute('SELECT user_id, status_account, created_at FROM "user" ORDER BY created_at DESC LIMIT 5')
-                recent_users = cursor.fetchall()
                 print(f"\n   Recent Users:")
-                for user_id, status, created in recent_users:
+                for user_id, status, created in cursor:
                     status_icon = "💎" if status == "Premium" else "🆓"
                     print(f"   {status_icon} {user_id} - {status} (joined: {created})")
 
@@ -260,32 +353,29 @@ def show_premium_stats(db_path):
             print(f"   Active Premium Data: {premium_data_count}")
 
             if premium_data_count > 0 and premium_data_count <= 5:
+                # expired_at is stored in UTC, like SQLite's datetime('now'), so
+                # the expiry check happens in SQL - the same test 'expired' uses
                 cursor.execute("""
-                    SELECT u.user_id, pd.premium_for, pd.expired_at, pd.created_at
+                    SELECT u.user_id, pd.premium_for, pd.expired_at,
+                           pd.expired_at < datetime('now') AS is_expired
                     FROM premium_data pd
                     JOIN "user" u ON pd.user_id = u.id
                     ORDER BY pd.created_at DESC
                     LIMIT 5
                 """)
-                recent_premium = cursor.fetchall()
                 print(f"\n   Recent Premium Subscriptions:")
-                for user_id, method, expired_at, created in recent_premium:
-                    now = datetime.now()
-                    expired_dt = datetime.fromisoformat(expired_at.replace('Z', '+00:00')) if expired_at else None
-                    status = "⏰ Expired" if expired_dt and expired_dt < now else "✅ Active"
+                for user_id, method, expired_at, is_expired in cursor:
+                    status = "⏰ Expired" if is_expired else "✅ Active"
                     print(f"   {status} User {user_id} - {method}")
                     print(f"      Expires: {expired_at}")
 
         # Count tokens
         if 'token' in existing_tables:
-            cursor.execute('SELECT COUNT(*) FROM token')
-            total_tokens = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT COUNT(*) FROM token WHERE is_used = 1')
-            used_tokens = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT COUNT(*) FROM token WHERE is_used = 0')
-            unused_tokens = cursor.fetchone()[0]
+            cursor.execute('SELECT is_used, COUNT(*) FROM token GROUP BY is_used')
+            used_counts = dict(cursor)
+            total_tokens = sum(used_counts.values())
+            used_tokens = used_counts.get(1, 0)
+            unused_tokens = used_counts.get(0, 0)
             
             print(f"\n🎫 TOKENS:")
             print(f"   Total Tokens: {total_tokens}")
@@ -294,13 +384,11 @@ def show_premium_stats(db_path):
 
             if unused_tokens > 0 and unused_tokens <= 3:
                 cursor.execute('SELECT token FROM token WHERE is_used = 0 LIMIT 3')
-                unused = cursor.fetchall()
                 print(f"\n   Sample Unused Tokens:")
-                for (token,) in unused:
+                for (token,) in cursor:
                     short_token = token[:50] + "..." if len(token) > 50 else token
                     print(f"   - {short_token}")
 
-        conn.close()
         print("\n" + "="*70)
         return True
 
@@ -310,128 +398,127 @@ def show_premium_stats(db_path):
         traceback.print_exc()
         return False
 
-def clean_premium_tables(db_path, table_type):
-    """Clean premium tables based on type."""
+def clean_premium_tables(conn, table_type, tables):
+    """Clean premium tables based on type.
+
+    Returns the number of rows removed, keyed like the show_database_stats
+    dict.
+    """
+    removed = {}
+    # Check if tables exist
+    existing_tables = [name for name in tables if name in PREMIUM_TABLES]
+    if table_type in ("used_tokens", "expired"):
+        # Only the conditional deletes look rows up through the indexes
+        ensure_indexes(conn, existing_tables)
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # Check if tables exist
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name IN ('user', 'premium_data', 'token')
-        """)
-        existing_tables = [row[0] for row in cursor.fetchall()]
+        with conn:
+            cursor = conn.cursor()
 
-        if not existing_tables:
-            print("\n⚠️  No premium tables found in database")
-            conn.close()
-            return
+            if not existing_tables:
+                print("\n⚠️  No premium tables found in database")
+                return removed
 
-        deleted_count = 0
+            deleted_count = 0
 
-        if table_type == "all":
-            print("\n🧹 CLEANING ALL PREMIUM DATA...")
+            if table_type == "all":
+                print("\n🧹 CLEANING ALL PREMIUM DATA...")
             
-            # Delete in correct order (foreign key constraints)
-            if 'premium_data' in existing_tables:
-                cursor.execute("SELECT COUNT(*) FROM premium_data")
-                count = cursor.fetchone()[0]
-                cursor.execute("DELETE FROM premium_data")
-                print(f"   ✅ Deleted {count} premium_data records")
-                deleted_count += count
+                # Delete in correct order (foreign key constraints)
+                if 'premium_data' in existing_tables:
+                    cursor.execute("DELETE FROM premium_data")
+                    count = removed['premium'] = cursor.rowcount
+                    print(f"   ✅ Deleted {count} premium_data records")
+                    deleted_count += count
             
-            if 'token' in existing_tables:
-                cursor.execute("SELECT COUNT(*) FROM token")
-                count = cursor.fetchone()[0]
-                cursor.execute("DELETE FROM token")
-                print(f"   ✅ Deleted {count} tokens")
-                deleted_count += count
+                if 'token' in existing_tables:
+                    cursor.execute("DELETE FROM token")
+                    count = removed['tokens'] = cursor.rowcount
+                    print(f"   ✅ Deleted {count} tokens")
+                    deleted_count += count
             
-            if 'user' in existing_tables:
-                cursor.execute('SELECT COUNT(*) FROM "user"')
-                count = cursor.fetchone()[0]
-                cursor.execute('DELETE FROM "user"')
-                print(f"   ✅ Deleted {count} users")
-                deleted_count += count
+                if 'user' in existing_tables:
+                    cursor.execute('DELETE FROM "user"')
+                    count = removed['users'] = cursor.rowcount
+                    print(f"   ✅ Deleted {count} users")
+                    deleted_count += count
             
-            # Reset auto-increment
-            cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('user', 'premium_data')")
-            print("   ✅ Reset auto-increment counters")
-
-        elif table_type == "users":
-            print("\n🧹 CLEANING USERS ONLY...")
-            if 'user' in existing_tables:
-                # First delete related premium_data
-                if 'premium_data' in existing_tables:
-                    cursor.execute("DELETE FROM premium_data")
-                    print("   ✅ Deleted related premium_data")
-                
-                cursor.execute('SELECT COUNT(*) FROM "user"')
-                count = cursor.fetchone()[0]
-                cursor.execute('DELETE FROM "user"')
-                print(f"   ✅ Deleted {count} users")
-                deleted_count = count
-                
-                cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'user'")
-
-        elif table_type == "tokens":
-            print("\n🧹 CLEANING TOKENS ONLY...")
-            if 'token' in existing_tables:
-                cursor.execute("SELECT COUNT(*) FROM token")
-                count = cursor.fetchone()[0]
-                cursor.execute("DELETE FROM token")
-                print(f"   ✅ Deleted {count} tokens")
-                deleted_count = count
-
-        elif table_type == "used_tokens":
-            print("\n🧹 CLEANING USED TOKENS ONLY...")
-            if 'token' in existing_tables:
-                cursor.execute("SELECT COUNT(*) FROM token WHERE is_used = 1")
-                count = cursor.fetchone()[0]
-                cursor.execute("DELETE FROM token WHERE is_used = 1")
-                print(f"   ✅ Deleted {count} used tokens")
-                deleted_count = count
-
-        elif table_type == "expired":
-            print("\n🧹 CLEANING EXPIRED PREMIUM SUBSCRIPTIONS...")
-            if 'premium_data' in existing_tables:
-                cursor.execute("""
-                    SELECT COUNT(*) FROM premium_data 
-                    WHERE expired_at < datetime('now')
-                """)
-                count = cursor.fetchone()[0]
+                # Reset auto-increment
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('user', 'premium_data')")
+                print("   ✅ Reset auto-increment counters")
+
+            elif table_type == "users":
+                print("\n🧹 CLEANING USERS ONLY...")
+                if 'user' in existing_tables:
+                    # First delete related premium_data
+                    if 'premium_data' in existing_tables:
+                        cursor.execute("DELETE FROM premium_data")
+                        removed['premium'] = cursor.rowcount
+                        print("   ✅ Deleted related premium_data")
                 
-                cursor.execute("""
-                    DELETE FROM premium_data 
-                    WHERE expired_at < datetime('now')
-                """)
-                print(f"   ✅ Deleted {count} expired premium subscriptions")
-                deleted_count = count
+                    cursor.execute('DELETE FROM "user"')
+                    count = removed['users'] = cursor.rowcount
+                    print(f"   ✅ Deleted {count} users")
+                    deleted_count = count
                 
-                # Update user status to Free
-                if 'user' in existing_tables:
+                    cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'user'")
+
+            elif table_type == "tokens":
+                print("\n🧹 CLEANING TOKENS ONLY...")
+                if 'token' in existing_tables:
+                    cursor.execute("DELETE FROM token")
+                    count = removed['tokens'] = cursor.rowcount
+                    print(f"   ✅ Deleted {count} tokens")
+                    deleted_count = count
+
+            elif table_type == "used_tokens":
+                print("\n🧹 CLEANING USED TOKENS ONLY...")
+                if 'token' in existing_tables:
+                    cursor.execute("DELETE FROM token WHERE is_used = 1")
+                    count = removed['tokens'] = cursor.rowcount
+                    print(f"   ✅ Deleted {count} used tokens")
+                    deleted_count = count
+
+            elif table_type == "expired":
+                print("\n🧹 CLEANING EXPIRED PREMIUM SUBSCRIPTIONS...")
+                if 'premium_data' in existing_tables:
                     cursor.execute("""
-                        UPDATE "user" 
-                        SET status_account = 'Free'
-                        WHERE id NOT IN (SELECT user_id FROM premium_data)
-                        AND status_account = 'Premium'
+                        DELETE FROM premium_data 
+                        WHERE expired_at < datetime('now')
+                        RETURNING id
                     """)
-                    updated = cursor.rowcount
-                    print(f"   ✅ Updated {updated} users to Free status")
+                    count = removed['premium'] = sum(1 for _ in cursor)
+                    print(f"   ✅ Deleted {count} expired premium subscriptions")
+                    deleted_count = count
+                
+                    # Update user status to Free
+                    if 'user' in existing_tables:
+                        # Anti-join: Premium users with no premium_data row left
+                        cursor.execute("""
+                            UPDATE "user" 
+                            SET status_account = 'Free'
+                            FROM (
+                                SELECT u.id
+                                FROM "user" u
+                                LEFT JOIN premium_data pd ON pd.user_id = u.id
+                                WHERE pd.user_id IS NULL AND u.status_account = 'Premium'
+                            ) AS lapsed
+                            WHERE "user".id = lapsed.id
+                        """)
+                        updated = cursor.rowcount
+                        print(f"   ✅ Updated {updated} users to Free status")
 
-        conn.commit()
-        conn.close()
         
         if deleted_count > 0:
             print(f"\n✅ Successfully deleted {deleted_count} records!")
         else:
             print("\n✅ Cleanup completed!")
+        return removed
 
     except Exception as e:
         print(f"\n❌ Error cleaning database: {e}")
         import traceback
         traceback.print_exc()
+        return {}
 
 def main():
     """Main cleanup function."""
@@ -444,215 +531,228 @@ def main():
     if not db_path:
         return
 
-    # Handle premium subcommands first
-    if len(sys.argv) >= 2 and sys.argv[1].lower() == "premium":
-        if len(sys.argv) == 2:
-            # Show premium stats only
-            show_premium_stats(db_path)
-            return
+    # One connection for the whole run keeps the page cache warm from the
+    # initial stats through cleanup to the final stats
+    conn = open_connection(db_path)
+    try:
+        tables = list_tables(conn)
+
+        # Handle premium subcommands first
+        if len(sys.argv) >= 2 and sys.argv[1].lower() == "premium":
+            if len(sys.argv) == 2:
+                # Show premium stats only
+                show_premium_stats(conn, tables)
+                return
         
-        # Premium cleanup subcommand
-        premium_action = sys.argv[2].lower() if len(sys.argv) >= 3 else ""
+            # Premium cleanup subcommand
+            premium_action = sys.argv[2].lower() if len(sys.argv) >= 3 else ""
         
-        if premium_action == "stats":
-            show_premium_stats(db_path)
-            return
+            if premium_action == "stats":
+                show_premium_stats(conn, tables)
+                return
         
-        # Show stats before cleanup
-        has_premium_tables = show_premium_stats(db_path)
-        if not has_premium_tables:
-            print("\n✅ No premium data to clean!")
-            return
+            # Show stats before cleanup
+            has_premium_tables = show_premium_stats(conn, tables)
+            if not has_premium_tables:
+                print("\n✅ No premium data to clean!")
+                return
         
-        # Handle premium cleanup actions
-        if premium_action == "all":
-            confirm = input("\n⚠️⚠️⚠️  Delete ALL premium data? This cannot be undone! (yes/no): ").lower()
-            if confirm in ["yes", "y"]:
-                confirm2 = input("Type 'DELETE' to confirm: ")
-                if confirm2 == "DELETE":
-                    clean_premium_tables(db_path, "all")
-                    vacuum_database(db_path)
-                    show_premium_stats(db_path)
+            # Handle premium cleanup actions
+            if premium_action == "all":
+                confirm = input("\n⚠️⚠️⚠️  Delete ALL premium data? This cannot be undone! (yes/no): ").lower()
+                if confirm in ["yes", "y"]:
+                    confirm2 = input("Type 'DELETE' to confirm: ")
+                    if confirm2 == "DELETE":
+                        clean_premium_tables(conn, "all", tables)
+                        vacuum_database(conn)
+                        show_premium_stats(conn, tables)
+                    else:
+                        print("Cancelled.")
                 else:
                     print("Cancelled.")
+            elif premium_action == "users":
+                confirm = input("\n⚠️  Delete all users? This will also delete related premium_data. (yes/no): ").lower()
+                if confirm in ["yes", "y"]:
+                    clean_premium_tables(conn, "users", tables)
+                    vacuum_database(conn)
+                    show_premium_stats(conn, tables)
+                else:
+                    print("Cancelled.")
+            elif premium_action == "tokens":
+                confirm = input("\n⚠️  Delete all tokens? (yes/no): ").lower()
+                if confirm in ["yes", "y"]:
+                    clean_premium_tables(conn, "tokens", tables)
+                    vacuum_database(conn)
+                    show_premium_stats(conn, tables)
+                else:
+                    print("Cancelled.")
+            elif premium_action == "used_tokens":
+                confirm = input("\n⚠️  Delete all used tokens? (yes/no): ").lower()
+                if confirm in ["yes", "y"]:
+                    clean_premium_tables(conn, "used_tokens", tables)
+                    vacuum_database(conn)
+                    show_premium_stats(conn, tables)
+                else:
+                    print("Cancelled.")
+            elif premium_action == "expired":
+                confirm = input("\n⚠️  Delete expired premium subscriptions? (yes/no): ").lower()
+                if confirm in ["yes", "y"]:
+                    clean_premium_tables(conn, "expired", tables)
+                    vacuum_database(conn)
+                    show_premium_stats(conn, tables)
+                else:
+                    print("Cancelled.")
+            elif premium_action == "vacuum":
+                vacuum_database(conn, force=True)
             else:
-                print("Cancelled.")
-        elif premium_action == "users":
-            confirm = input("\n⚠️  Delete all users? This will also delete related premium_data. (yes/no): ").lower()
-            if confirm in ["yes", "y"]:
-                clean_premium_tables(db_path, "users")
-                vacuum_database(db_path)
-                show_premium_stats(db_path)
-            else:
-                print("Cancelled.")
-        elif premium_action == "tokens":
-            confirm = input("\n⚠️  Delete all tokens? (yes/no): ").lower()
-            if confirm in ["yes", "y"]:
-                clean_premium_tables(db_path, "tokens")
-                vacuum_database(db_path)
-                show_premium_stats(db_path)
-            else:
-                print("Cancelled.")
-        elif premium_action == "used_tokens":
-            confirm = input("\n⚠️  Delete all used tokens? (yes/no): ").lower()
-            if confirm in ["yes", "y"]:
-                clean_premium_tables(db_path, "used_tokens")
-                vacuum_database(db_path)
-                show_premium_stats(db_path)
-            else:
-                print("Cancelled.")
-        elif premium_action == "expired":
-            confirm = input("\n⚠️  Delete expired premium subscriptions? (yes/no): ").lower()
-            if confirm in ["yes", "y"]:
-                clean_premium_tables(db_path, "expired")
-                vacuum_database(db_path)
-                show_premium_stats(db_path)
-            else:
-                print("Cancelled.")
-        elif premium_action == "vacuum":
-            vacuum_database(db_path)
-        else:
-            print("\nUsage: python cleanup.py premium [all|users|tokens|used_tokens|expired|vacuum|stats]")
-            print("\nOptions:")
-            print("  all         - Delete ALL premium data (users + premium_data + tokens)")
-            print("  users       - Delete users only (+ related premium_data)")
-            print("  tokens      - Delete all tokens")
-            print("  used_tokens - Delete used tokens only")
-            print("  expired     - Delete expired premium subscriptions")
-            print("  vacuum      - Vacuum database to reclaim space")
-            print("  stats       - Show premium statistics only")
-        return
+                print("\nUsage: python cleanup.py premium [all|users|tokens|used_tokens|expired|vacuum|stats]")
+                print("\nOptions:")
+                print("  all         - Delete ALL premium data (users + premium_data + tokens)")
+                print("  users       - Delete users only (+ related premium_data)")
+                print("  tokens      - Delete all tokens")
+                print("  used_tokens - Delete used tokens only")
+                print("  expired     - Delete expired premium subscriptions")
+                print("  vacuum      - Vacuum database to reclaim space")
+                print("  stats       - Show premium statistics only")
+            return
 
-    # Show current stats
-    invoice_count, item_count = show_database_stats(db_path)
-
-    # Interactive mode if no arguments
-    if len(sys.argv) == 1:
-        print("\n🧹 CLEANUP OPTIONS:")
-        print("1. Clean all invoices data")
-        print("2. Clean items only")
-        print("3. Clean old data (7+ days)")
-        print("4. Clean test data")
-        print("5. Clean spending limits")
-        print("6. Clean EVERYTHING (invoices + limits)")
-        print("7. Premium data cleanup (interactive)")
-        print("8. Just vacuum database")
-        print("0. Exit")
-
-        choice = input("\nSelect option (0-8): ").strip()
-
-        if choice == "1":
-            confirm = input("⚠️  Delete ALL invoices? (yes/no): ").lower()
-            if confirm in ["yes", "y"]:
-                clean_database(db_path, "all")
-                vacuum_database(db_path)
-        elif choice == "2":
-            clean_database(db_path, "items")
-            vacuum_database(db_path)
-        elif choice == "3":
-            clean_database(db_path, "old")
-            vacuum_database(db_path)
-        elif choice == "4":
-            clean_database(db_path, "test")
-            vacuum_database(db_path)
-        elif choice == "5":
-            confirm = input("⚠️  Delete ALL spending limits? (yes/no): ").lower()
-            if confirm in ["yes", "y"]:
-                clean_database(db_path, "limits")
-                vacuum_database(db_path)
-        elif choice == "6":
-            confirm = input("⚠️⚠️⚠️  DELETE EVERYTHING? This cannot be undone! (yes/no): ").lower()
-            if confirm in ["yes", "y"]:
-                confirm2 = input("Type 'DELETE' to confirm: ")
-                if confirm2 == "DELETE":
-                    clean_database(db_path, "everything")
-                    vacuum_database(db_path)
+        # Show current stats
+        stats = show_database_stats(conn, tables)
+        removed = {}
+
+        # Interactive mode if no arguments
+        if len(sys.argv) == 1:
+            print("\n🧹 CLEANUP OPTIONS:")
+            print("1. Clean all invoices data")
+            print("2. Clean items only")
+            print("3. Clean old data (7+ days)")
+            print("4. Clean test data")
+            print("5. Clean spending limits")
+            print("6. Clean EVERYTHING (invoices + limits)")
+            print("7. Premium data cleanup (interactive)")
+            print("8. Just vacuum database")
+            print("0. Exit")
+
+            choice = input("\nSelect option (0-8): ").strip()
+
+            if choice == "1":
+                confirm = input("⚠️  Delete ALL invoices? (yes/no): ").lower()
+                if confirm in ["yes", "y"]:
+                    removed = clean_database(conn, "all")
+                    vacuum_database(conn)
+            elif choice == "2":
+                removed = clean_database(conn, "items")
+                vacuum_database(conn)
+            elif choice == "3":
+                removed = clean_database(conn, "old")
+                vacuum_database(conn)
+            elif choice == "4":
+                removed = clean_database(conn, "test")
+                vacuum_database(conn)
+            elif choice == "5":
+                confirm = input("⚠️  Delete ALL spending limits? (yes/no): ").lower()
+                if confirm in ["yes", "y"]:
+                    removed = clean_database(conn, "limits")
+                    vacuum_database(conn)
+            elif choice == "6":
+                confirm = input("⚠️⚠️⚠️  DELETE EVERYTHING? This cannot be undone! (yes/no): ").lower()
+                if confirm in ["yes", "y"]:
+                    confirm2 = input("Type 'DELETE' to confirm: ")
+                    if confirm2 == "DELETE":
+                        removed = clean_database(conn, "everything")
+                        vacuum_database(conn)
+                    else:
+                        print("Cancelled.")
                 else:
                     print("Cancelled.")
-            else:
-                print("Cancelled.")
-        elif choice == "7":
-            # Premium cleanup submenu
-            has_premium_tables = show_premium_stats(db_path)
-            if not has_premium_tables:
-                print("\n✅ No premium data to clean!")
-            else:
-                print("\n💎 PREMIUM CLEANUP OPTIONS:")
-                print("1. Clean ALL premium data (users + premium_data + tokens)")
-                print("2. Clean users only (+ related premium_data)")
-                print("3. Clean tokens only")
-                print("4. Clean used tokens only")
-                print("5. Clean expired premium subscriptions")
-                print("0. Back")
+            elif choice == "7":
+                # Premium cleanup submenu
+                has_premium_tables = show_premium_stats(conn, tables)
+                if not has_premium_tables:
+                    print("\n✅ No premium data to clean!")
+                else:
+                    print("\n💎 PREMIUM CLEANUP OPTIONS:")
+                    print("1. Clean ALL premium data (users + premium_data + tokens)")
+                    print("2. Clean users only (+ related premium_data)")
+                    print("3. Clean tokens only")
+                    print("4. Clean used tokens only")
+                    print("5. Clean expired premium subscriptions")
+                    print("0. Back")
                 
-                premium_choice = input("\nSelect option (0-5): ").strip()
+                    premium_choice = input("\nSelect option (0-5): ").strip()
                 
-                if premium_choice == "1":
-                    confirm = input("⚠️⚠️⚠️  Delete ALL premium data? (yes/no): ").lower()
-                    if confirm in ["yes", "y"]:
-                        confirm2 = input("Type 'DELETE' to confirm: ")
-                        if confirm2 == "DELETE":
-                            clean_premium_tables(db_path, "all")
-                            vacuum_database(db_path)
-                elif premium_choice == "2":
-                    clean_premium_tables(db_path, "users")
-                    vacuum_database(db_path)
-                elif premium_choice == "3":
-                    clean_premium_tables(db_path, "tokens")
-                    vacuum_database(db_path)
-                elif premium_choice == "4":
-                    clean_premium_tables(db_path, "used_tokens")
-                    vacuum_database(db_path)
-                elif premium_choice == "5":
-                    clean_premium_tables(db_path, "expired")
-                    vacuum_database(db_path)
-        elif choice == "8":
-            vacuum_database(db_path)
-        elif choice == "0":
-            print("Exiting...")
-        else:
-            print("Invalid option!")
+                    if premium_choice == "1":
+                        confirm = input("⚠️⚠️⚠️  Delete ALL premium data? (yes/no): ").lower()
+                        if confirm in ["yes", "y"]:
+                            confirm2 = input("Type 'DELETE' to confirm: ")
+                            if confirm2 == "DELETE":
+                                removed = clean_premium_tables(conn, "all", tables)
+                                vacuum_database(conn)
+                    elif premium_choice == "2":
+                        removed = clean_premium_tables(conn, "users", tables)
+                        vacuum_database(conn)
+                    elif premium_choice == "3":
+                        removed = clean_premium_tables(conn, "tokens", tables)
+                        vacuum_database(conn)
+                    elif premium_choice == "4":
+                        removed = clean_premium_tables(conn, "used_tokens", tables)
+                        vacuum_database(conn)
+                    elif premium_choice == "5":
+                        removed = clean_premium_tables(conn, "expired", tables)
+                        vacuum_database(conn)
+            elif choice == "8":
+                vacuum_database(conn, force=True)
+            elif choice == "0":
+                print("Exiting...")
+            else:
+                print("Invalid option!")
 
-    # Command line arguments
-    else:
-        action = sys.argv[1].lower()
-        if action in ["all", "items", "old", "test", "limits", "everything"]:
-            if action in ["all", "limits", "everything"]:
-                confirm = input(f"⚠️  Delete {action.upper()} data? (yes/no): ").lower()
-                if confirm not in ["yes", "y"]:
-                    print("Cancelled.")
-                    return
-            clean_database(db_path, action)
-            vacuum_database(db_path)
-        elif action == "vacuum":
-            vacuum_database(db_path)
-        elif action == "stats":
-            pass  # Already shown above
+        # Command line arguments
         else:
-            print(f"\nUsage: {sys.argv[0]} [command] [options]")
-            print("\nInvoice Commands:")
-            print("  all        - Delete all invoices and items")
-            print("  items      - Delete invoice items only")
-            print("  old        - Delete invoices older than 7 days")
-            print("  test       - Delete test invoices")
-            print("  limits     - Delete spending limits")
-            print("  everything - Delete invoices + limits (not premium)")
-            print("  vacuum     - Vacuum database to reclaim space")
-            print("  stats      - Show database statistics only")
-            print("\nPremium Commands:")
-            print("  premium [action]  - Manage premium data")
-            print("    Actions: all, users, tokens, used_tokens, expired, vacuum, stats")
-            print("\nExamples:")
-            print("  python cleanup.py all")
-            print("  python cleanup.py premium users")
-            print("  python cleanup.py premium tokens")
-            print("  python cleanup.py premium expired")
-
-    # Show final stats
-    if len(sys.argv) == 1 or (len(sys.argv) >= 2 and sys.argv[1] not in ["stats", "vacuum", "premium"]):
-        print("\n" + "=" * 70)
-        print("FINAL STATISTICS")
-        show_database_stats(db_path)
+            action = sys.argv[1].lower()
+            if action in ["all", "items", "old", "test", "limits", "everything"]:
+                if action in ["all", "limits", "everything"]:
+                    confirm = input(f"⚠️  Delete {action.upper()} data? (yes/no): ").lower()
+                    if confirm not in ["yes", "y"]:
+                        print("Cancelled.")
+                        return
+                removed = clean_database(conn, action)
+                vacuum_database(conn)
+            elif action == "vacuum":
+                vacuum_database(conn, force=True)
+            elif action == "stats":
+                pass  # Already shown above
+            else:
+                print(f"\nUsage: {sys.argv[0]} [command] [options]")
+                print("\nInvoice Commands:")
+                print("  all        - Delete all invoices and items")
+                print("  items      - Delete invoice items only")
+                print("  old        - Delete invoices older than 7 days")
+                print("  test       - Delete test invoices")
+                print("  limits     - Delete spending limits")
+                print("  everything - Delete invoices + limits (not premium)")
+                print("  vacuum     - Vacuum database to reclaim space")
+                print("  stats      - Show database statistics only")
+                print("\nPremium Commands:")
+                print("  premium [action]  - Manage premium data")
+                print("    Actions: all, users, tokens, used_tokens, expired, vacuum, stats")
+                print("\nExamples:")
+                print("  python cleanup.py all")
+                print("  python cleanup.py premium users")
+                print("  python cleanup.py premium tokens")
+                print("  python cleanup.py premium expired")
+
+        # Show final stats
+        if len(sys.argv) == 1 or (len(sys.argv) >= 2 and sys.argv[1] not in ["stats", "vacuum", "premium"]):
+            print("\n" + "=" * 70)
+            print("FINAL STATISTICS")
+            if stats is None:
+                show_database_stats(conn, tables)
+            else:
+                # Counts follow from what the cleanup removed - no need to re-query
+                print_stat_counts(remaining_stats(stats, removed))
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
     try:
@@ -1,71 +1,80 @@
 """
 Generate multiple unique premium tokens for distribution
-Each token has a unique timestamp to ensure uniqueness
+Each token carries a unique token ID (jti) to ensure uniqueness
 """
 import os
 import sys
-import time
 from datetime import datetime
 
-# Set the JWT secret to match Railway
-os.environ['JWT_SECRET_KEY'] = 'lRWZXEoTdCfkN-iIsNdx5AoP7Y9aSsIdKw0MaEm59_IDG1DHEBxaSwpzeK4MczG6RX5ezecHTuwk6KvT1jrRSQ'
+from dotenv import dotenv_values
+
+# Sign with the Railway JWT secret: RAILWAY_JWT_SECRET_KEY from the
+# environment or .env, falling back to the local JWT_SECRET_KEY
+railway_secret = os.getenv('RAILWAY_JWT_SECRET_KEY') or dotenv_values('.env').get('RAILWAY_JWT_SECRET_KEY')
+if railway_secret:
+    os.environ['JWT_SECRET_KEY'] = railway_secret
 
 # Now import the function
 from telegram_bot.premium import generate_test_token
 
-print("=" * 70)
-print("🎫 GENERATING 15 UNIQUE PREMIUM TOKENS (30 DAYS EACH)")
-print("=" * 70)
-print(f"\n✅ Using Railway JWT Secret Key")
-print(f"🕐 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-print("=" * 70)
-print()
-
-tokens = []
-for i in range(15):
-    token = generate_test_token(30)
-    tokens.append(token)
-    print(f"Token {i+1}:")
-    print(token)
-    print()
-    # Small delay to ensure unique timestamps
-    time.sleep(0.1)
+generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+tokens = [generate_test_token(30, nonce=i) for i in range(15)]
 
-print("=" * 70)
-print("✅ All 15 tokens generated successfully!")
-print("=" * 70)
-print()
-print("📋 USAGE:")
-print("1. Copy any token above")
-print("2. Send /premium to the bot")
-print("3. Paste the token when prompted")
-print()
-print("⚠️  IMPORTANT:")
-print("- Each token can only be used ONCE")
-print("- Tokens expire in 30 days from generation")
-print("- Keep these tokens secure!")
-print()
+# Build the console report and the distribution file in memory, then write
+# each out with a single call
+lines = [
+    "=" * 70,
+    "🎫 GENERATING 15 UNIQUE PREMIUM TOKENS (30 DAYS EACH)",
+    "=" * 70,
+    "\n✅ Using Railway JWT Secret Key" if railway_secret else "\n⚠️  RAILWAY_JWT_SECRET_KEY not set - using local JWT_SECRET_KEY",
+    f"🕐 Generated: {generated_at}",
+    "=" * 70,
+    "",
+]
+for i, token in enumerate(tokens, 1):
+    lines += [f"Token {i}:", token, ""]
+lines += [
+    "=" * 70,
+    "✅ All 15 tokens generated successfully!",
+    "=" * 70,
+    "",
+    "📋 USAGE:",
+    "1. Copy any token above",
+    "2. Send /premium to the bot",
+    "3. Paste the token when prompted",
+    "",
+    "⚠️  IMPORTANT:",
+    "- Each token can only be used ONCE",
+    "- Tokens expire in 30 days from generation",
+    "- Keep these tokens secure!",
+    "",
+]
+sys.stdout.write("\n".join(lines) + "\n")
 
 # Save to file for easy distribution
 output_file = 'premium_tokens.txt'
+body = "\n".join([
+    "=" * 70,
+    "15 PREMIUM TOKENS (30 DAYS)",
+    "Generated: " + generated_at,
+    "=" * 70,
+    "",
+    "".join(f"Token {i}:\n{token}\n\n" for i, token in enumerate(tokens, 1)),
+    "USAGE INSTRUCTIONS:",
+    "=" * 70,
+    "1. Give one token to each user",
+    "2. User sends /premium to the bot",
+    "3. User pastes the token when prompted",
+    "",
+    "IMPORTANT NOTES:",
+    "=" * 70,
+    "- Each token can only be used ONCE",
+    "- Tokens are valid for 30 days from generation",
+    "- After use, the token will be marked as 'used' in database",
+    "- Keep tokens secure and distribute carefully",
+    "",
+])
 with open(output_file, 'w', encoding='utf-8') as f:
-    f.write("=" * 70 + "\n")
-    f.write("15 PREMIUM TOKENS (30 DAYS)\n")
-    f.write("Generated: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n")
-    f.write("=" * 70 + "\n\n")
-    for i, token in enumerate(tokens, 1):
-        f.write(f"Token {i}:\n{token}\n\n")
-    f.write("\nUSAGE INSTRUCTIONS:\n")
-    f.write("=" * 70 + "\n")
-    f.write("1. Give one token to each user\n")
-    f.write("2. User sends /premium to the bot\n")
-    f.write("3. User pastes the token when prompted\n")
-    f.write("\nIMPORTANT NOTES:\n")
-    f.write("=" * 70 + "\n")
-    f.write("- Each token can only be used ONCE\n")
-    f.write("- Tokens are valid for 30 days from generation\n")
-    f.write("- After use, the token will be marked as 'used' in database\n")
-    f.write("- Keep tokens secure and distribute carefully\n")
+    f.write(body)
 
-print(f"💾 Tokens also saved to: {output_file}")
-print()
+sys.stdout.write(f"💾 Tokens also saved to: {output_file}\n\n")
@@ -8,6 +8,37 @@ import json
 from datetime import datetime
 import os
 import sys
+from pathlib import Path
+
+# Bulk-read settings for the export scan: serve pages from mmap and keep a
+# 64 MB page cache. The journal mode is left alone - the connection is
+# read-only and the live database may be in WAL mode
+READ_PRAGMAS = """
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+    PRAGMA temp_store=MEMORY;
+"""
+
+# Rows fetched from SQLite per round trip while streaming a table
+FETCH_BATCH_SIZE = 10000
+
+# Write buffer for the export file; records are written one at a time
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Id columns collected while the export streams, for the checks in verify_export
+VERIFY_COLUMNS = {
+    'invoices': 'id',
+    'invoice_items': 'invoice_id',
+    'platform_users': 'id',
+    'spending_limits_v2': 'user_id',
+}
+
+# Try importing orjson for faster JSON encoding (falls back to json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 def get_db_path():
     """Get the absolute path to the SQLite database"""
@@ -17,31 +48,58 @@ def get_db_path():
     return os.path.join(invoice_rag_dir, 'database', 'invoices.db')
 
 def export_table(cursor, table_name):
-    """Export a single table to a list of dictionaries"""
+    """Export a single table as an iterator of dictionaries, read in batches"""
     try:
         cursor.execute(f"SELECT * FROM {table_name}")
-        columns = [description[0] for description in cursor.description]
-        rows = cursor.fetchall()
-
-        data = []
-        for row in rows:
-            record = {}
-            for i, column in enumerate(columns):
-                record[column] = row[i]
-            data.append(record)
-
-        return data
     except sqlite3.OperationalError as e:
         print(f"⚠️  Warning: Could not export table '{table_name}': {e}")
-        return []
+        return iter(())
+
+    columns = [description[0] for description in cursor.description]
+    batches = iter(lambda: cursor.fetchmany(FETCH_BATCH_SIZE), [])
+    return (dict(zip(columns, row)) for batch in batches for row in batch)
+
+def track_ids(records, field, ids):
+    """Pass records through unchanged, adding each record's field to ids"""
+    for record in records:
+        ids.add(record[field])
+        yield record
+
+def dump_json(value):
+    """Encode a value as indented UTF-8 JSON bytes"""
+    if ORJSON_AVAILABLE:
+        # orjson always writes UTF-8; default=str still covers BLOB columns
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(value, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+
+def write_table(f, table_name, records, first):
+    """Stream one table into the export file as it is read.
+
+    Produces the same layout as dumping the whole {table: [records]} dict
+    with indent=2, without holding the table in memory. Returns the number
+    of records written.
+    """
+    f.write(b'{\n  ' if first else b',\n  ')
+    f.write(dump_json(table_name) + b': [')
+    count = 0
+    for record in records:
+        f.write(b'\n    ' if count == 0 else b',\n    ')
+        # Nest the record two levels deep; JSON strings never contain raw newlines
+        f.write(dump_json(record).replace(b'\n', b'\n    '))
+        count += 1
+    f.write(b'\n  ]' if count else b']')
+    return count
 
 def export_data():
-    """Export all data from SQLite database"""
+    """Export all data from SQLite database.
+
+    Returns (export_path, id_sets), or None if the database does not exist.
+    """
     db_path = get_db_path()
 
     if not os.path.exists(db_path):
         print(f"❌ Error: Database file not found at {db_path}")
-        sys.exit(1)
+        return None
 
     print("=" * 70)
     print("🚀 SQLite Data Export Tool")
@@ -49,7 +107,8 @@ def export_data():
     print(f"📁 Database: {db_path}")
     print()
 
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(f"{Path(db_path).as_uri()}?mode=ro", uri=True)
+    conn.executescript(READ_PRAGMAS)
     cursor = conn.cursor()
 
     # Get list of all tables
@@ -58,45 +117,6 @@ def export_data():
     print(f"📊 Found {len(all_tables)} tables: {', '.join(all_tables)}")
     print()
 
-    data = {}
-    total_records = 0
-
-    # Export core tables in order (to maintain foreign key relationships)
-    tables_to_export = [
-        'invoices',
-        'invoice_items',
-        'platform_users',
-        'spending_limits',
-        'spending_limits_v2'
-    ]
-
-    for table_name in tables_to_export:
-        if table_name in all_tables:
-            print(f"📦 Exporting table: {table_name}")
-            table_data = export_table(cursor, table_name)
-            data[table_name] = table_data
-            record_count = len(table_data)
-            total_records += record_count
-            print(f"   ✅ Exported {record_count} records")
-        else:
-            print(f"   ⚠️  Table '{table_name}' not found, skipping")
-            data[table_name] = []
-
-    # Export any additional tables not in the main list
-    additional_tables = [t for t in all_tables if t not in tables_to_export]
-    if additional_tables:
-        print()
-        print("📦 Exporting additional tables:")
-        for table_name in additional_tables:
-            print(f"   {table_name}")
-            table_data = export_table(cursor, table_name)
-            data[table_name] = table_data
-            record_count = len(table_data)
-            total_records += record_count
-            print(f"   ✅ Exported {record_count} records")
-
-    conn.close()
-
     # Create export directory if it doesn't exist
     export_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -105,11 +125,54 @@ def export_data():
     export_filename = f'sqlite_export_{timestamp}.json'
     export_path = os.path.join(export_dir, export_filename)
 
-    # Save to JSON file
+    # Tables are streamed straight into the JSON file as they are read
+    print(f"💾 Streaming data to JSON file: {export_filename}")
     print()
-    print("💾 Saving data to JSON file...")
-    with open(export_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+    with open(export_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        counts = {}
+        id_sets = {}
+        total_records = 0
+
+        # Export core tables in order (to maintain foreign key relationships)
+        tables_to_export = [
+            'invoices',
+            'invoice_items',
+            'platform_users',
+            'spending_limits',
+            'spending_limits_v2'
+        ]
+
+        for table_name in tables_to_export:
+            if table_name in all_tables:
+                print(f"📦 Exporting table: {table_name}")
+                table_data = export_table(cursor, table_name)
+                if table_name in VERIFY_COLUMNS:
+                    id_sets[table_name] = set()
+                    table_data = track_ids(table_data, VERIFY_COLUMNS[table_name], id_sets[table_name])
+            else:
+                print(f"   ⚠️  Table '{table_name}' not found, skipping")
+                table_data = ()
+            record_count = write_table(f, table_name, table_data, first=not counts)
+            counts[table_name] = record_count
+            total_records += record_count
+            if table_name in all_tables:
+                print(f"   ✅ Exported {record_count} records")
+
+        # Export any additional tables not in the main list
+        additional_tables = [t for t in all_tables if t not in tables_to_export]
+        if additional_tables:
+            print()
+            print("📦 Exporting additional tables:")
+            for table_name in additional_tables:
+                print(f"   {table_name}")
+                table_data = export_table(cursor, table_name)
+                record_count = write_table(f, table_name, table_data, first=not counts)
+                counts[table_name] = record_count
+                total_records += record_count
+                print(f"   ✅ Exported {record_count} records")
+
+        f.write(b'\n}')
+    conn.close()
 
     file_size = os.path.getsize(export_path)
     file_size_mb = file_size / (1024 * 1024)
@@ -123,40 +186,40 @@ def export_data():
     print(f"💾 File size: {file_size_mb:.2f} MB")
     print()
     print("📋 Export summary:")
-    for table_name, table_data in data.items():
-        if table_data:
-            print(f"   • {table_name}: {len(table_data)} records")
+    for table_name, record_count in counts.items():
+        if record_count:
+            print(f"   • {table_name}: {record_count} records")
     print()
     print("🚀 Next step: Run import_to_supabase.py with this export file")
     print(f"   python migration/import_to_supabase.py migration/{export_filename}")
     print("=" * 70)
 
-    return export_path
+    return export_path, id_sets
 
-def verify_export(export_path):
-    """Verify the exported data"""
+def verify_export(id_sets):
+    """Verify the exported data using the id sets collected by export_data"""
     print()
     print("🔍 Verifying export...")
 
-    with open(export_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    def collect_ids(table_name):
+        return id_sets.get(table_name, set())
 
     # Check for data integrity
     issues = []
 
     # Check if invoices have corresponding items
-    if data.get('invoices') and data.get('invoice_items'):
-        invoice_ids = set(inv['id'] for inv in data['invoices'])
-        item_invoice_ids = set(item['invoice_id'] for item in data['invoice_items'])
+    invoice_ids = collect_ids('invoices')
+    item_invoice_ids = collect_ids('invoice_items')
+    if invoice_ids and item_invoice_ids:
         orphaned_items = item_invoice_ids - invoice_ids
 
         if orphaned_items:
             issues.append(f"⚠️  Found {len(orphaned_items)} orphaned invoice items")
 
     # Check if spending_limits_v2 references valid platform_users
-    if data.get('spending_limits_v2') and data.get('platform_users'):
-        user_ids = set(user['id'] for user in data['platform_users'])
-        limit_user_ids = set(limit['user_id'] for limit in data['spending_limits_v2'])
+    limit_user_ids = collect_ids('spending_limits_v2')
+    user_ids = collect_ids('platform_users')
+    if limit_user_ids and user_ids:
         invalid_refs = limit_user_ids - user_ids
 
         if invalid_refs:
@@ -169,12 +232,20 @@ def verify_export(export_path):
     else:
         print("✅ Verification passed: No data integrity issues found")
 
-if __name__ == '__main__':
+def main():
+    """Run the export and its verification, returning an exit code"""
     try:
-        export_path = export_data()
-        verify_export(export_path)
+        result = export_data()
+        if result is None:
+            return 1
+        export_path, id_sets = result
+        verify_export(id_sets)
+        return 0
     except Exception as e:
         print(f"❌ Error during export: {e}")
         import traceback
         traceback.print_exc()
-        sys.exit(1)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
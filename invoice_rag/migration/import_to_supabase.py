@@ -1,20 +1,34 @@
 #!/usr/bin/env python3
 """
 Supabase Data Import Script
-Imports data from JSON export to Supabase PostgreSQL database
+Imports data from JSON export (or straight from the SQLite database) to
+Supabase PostgreSQL database
 """
+import csv
+import io
 import json
+import mmap
 import os
+import sqlite3
 import sys
+from collections.abc import Mapping
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import closing
 from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
 from dotenv import load_dotenv
 
+from export_sqlite_data import READ_PRAGMAS, export_table
+
 # Load environment variables
 load_dotenv()
 
 # Try importing Supabase client
 try:
     from supabase import create_client, Client
+    from postgrest.types import ReturnMethod
     SUPABASE_AVAILABLE = True
 except ImportError:
     SUPABASE_AVAILABLE = False
@@ -23,12 +37,141 @@ except ImportError:
 # Try importing psycopg2 for direct database access
 try:
     import psycopg2
-    from psycopg2.extras import execute_batch
     PSYCOPG2_AVAILABLE = True
 except ImportError:
     PSYCOPG2_AVAILABLE = False
     print("⚠️  Warning: psycopg2 not installed. Install with: pip install psycopg2-binary")
 
+# Try importing ijson for streaming large export files (falls back to json.load)
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Try importing orjson for faster parsing when not streaming (falls back to json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class StreamedExport(Mapping):
+    """Read-only view of an export file that streams one table at a time.
+
+    Looking a table up returns an iterator that parses its records as they
+    are consumed, so no table is ever held in memory whole. Record counts
+    come from a single streaming pass on open.
+    """
+
+    def __init__(self, export_file):
+        self.export_file = export_file
+        self.counts = {}
+        with open(export_file, 'rb') as f:
+            for prefix, event, value in ijson.parse(f):
+                if prefix == '' and event == 'map_key':
+                    self.counts[value] = 0
+                elif event == 'start_map' and prefix.endswith('.item') and prefix.count('.') == 1:
+                    self.counts[prefix[:-len('.item')]] += 1
+
+    def __getitem__(self, table_name):
+        if table_name not in self.counts:
+            raise KeyError(table_name)
+        return self._records(table_name)
+
+    def _records(self, table_name):
+        with open(self.export_file, 'rb') as f:
+            yield from ijson.items(f, f'{table_name}.item', use_float=True)
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class SQLiteSource(Mapping):
+    """Read-only view of a SQLite database that streams one table at a time.
+
+    Lets the import run straight from invoices.db, skipping the write and
+    re-parse of a JSON export. Looking a table up returns an iterator over
+    its rows, fetched in batches as they are consumed. Records have the
+    same shape as in an export.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            tables = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            )]
+            self.counts = {
+                table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                for table in tables
+            }
+
+    def _connect(self):
+        conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True)
+        conn.executescript(READ_PRAGMAS)
+        return conn
+
+    def __getitem__(self, table_name):
+        if table_name not in self.counts:
+            raise KeyError(table_name)
+        return self._records(table_name)
+
+    def _records(self, table_name):
+        # The connection stays open while the rows are consumed, and is
+        # made in the thread that reads them
+        with closing(self._connect()) as conn:
+            yield from export_table(conn.cursor(), table_name)
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class ParsedExport(dict):
+    """An export file parsed whole, used when ijson is not installed.
+
+    Carries the same per-table record counts as the streamed sources.
+    """
+
+    def __init__(self, tables):
+        super().__init__(tables)
+        self.counts = {
+            table: len(records) for table, records in tables.items() if isinstance(records, list)
+        }
+
+
+# Import sources ending in one of these are read as SQLite databases
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+def load_export(export_file):
+    """Open an export file or SQLite database, returning (data, total_records)"""
+    if export_file.endswith(SQLITE_SUFFIXES):
+        data = SQLiteSource(export_file)
+        return data, sum(data.counts.values())
+
+    if IJSON_AVAILABLE:
+        data = StreamedExport(export_file)
+        return data, sum(data.counts.values())
+
+    with open(export_file, 'rb') as f:
+        if ORJSON_AVAILABLE and os.fstat(f.fileno()).st_size:
+            # Parse straight from the mapped pages instead of a read() copy
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    data = orjson.loads(view)
+        else:
+            data = json.load(f)
+    data = ParsedExport(data)
+    return data, sum(data.counts.values())
+
 
 def get_supabase_client():
     """Initialize Supabase client"""
@@ -47,6 +190,16 @@ def get_supabase_client():
     return create_client(supabase_url, supabase_key)
 
 
+# TCP keepalives so an idle pooler connection is not silently dropped while
+# a large table is being prepared or loaded
+POSTGRES_KEEPALIVES = {
+    'keepalives': 1,
+    'keepalives_idle': 30,
+    'keepalives_interval': 10,
+    'keepalives_count': 3,
+}
+
+
 def get_postgres_connection():
     """Get direct PostgreSQL connection"""
     if not PSYCOPG2_AVAILABLE:
@@ -69,8 +222,118 @@ def get_postgres_connection():
         port=port,
         database=database,
         user=user,
-        password=password
+        password=password,
+        **POSTGRES_KEEPALIVES
+    )
+
+
+# Records per Supabase insert request. Halved on the fly (down to the
+# minimum) if PostgREST rejects a request body as too large
+SUPABASE_BATCH_SIZE = 10000
+SUPABASE_MIN_BATCH_SIZE = 100
+
+
+def is_payload_too_large(error):
+    """Check whether a Supabase error is an HTTP 413 (request body too large)"""
+    message = str(error)
+    return '413' in message or 'too large' in message.lower()
+
+
+# NULL marker for COPY ... FROM STDIN WITH (FORMAT CSV)
+COPY_NULL = '\\N'
+
+
+class CopyStream(io.TextIOBase):
+    """File-like object rendering rows as COPY CSV as they are read.
+
+    copy_expert pulls the data in fixed-size reads, and each read only
+    consumes as many rows as it needs, so a table flows from its source
+    into COPY without being held in memory. count is the number of rows
+    written so far.
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.count = 0
+        self.buf = io.StringIO()
+        self.writer = csv.writer(self.buf, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size is None or size < 0 or self.buf.tell() < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.writer.writerow(tuple(COPY_NULL if value is None else value for value in row))
+            self.count += 1
+        text = self.buf.getvalue()
+        if size is not None and size >= 0:
+            text, rest = text[:size], text[size:]
+        else:
+            rest = ''
+        self.buf.seek(0)
+        self.buf.truncate()
+        self.buf.write(rest)
+        return text
+
+
+def copy_rows(cursor, table_name, columns, rows):
+    """Bulk-load rows into a table with COPY FROM STDIN (CSV), returning the row count"""
+    stream = CopyStream(rows)
+    cursor.copy_expert(
+        f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT CSV, NULL '{COPY_NULL}')",
+        stream
     )
+    return stream.count
+
+
+def record_rows(records, columns):
+    """Yield the values of columns from each record, in order.
+
+    Exports from an older schema may lack a column - it is imported as NULL.
+    """
+    get_row = itemgetter(*columns)
+    for record in records:
+        try:
+            yield get_row(record)
+        except KeyError:
+            yield tuple(record.get(col) for col in columns)
+
+
+# Tables grouped by foreign-key dependencies: each level only references
+# tables in earlier levels, so the tables within a level are loaded in
+# parallel, each over its own connection
+IMPORT_LEVELS = [
+    ['platform_users', 'invoices', 'spending_limits'],
+    ['invoice_items', 'spending_limits_v2'],
+]
+IMPORT_WORKERS = 4
+
+
+def import_by_level(import_table, data, stats):
+    """Call import_table(table_name, data) for every table, level by level.
+
+    import_table reads its table from data itself, so each worker parses
+    or queries its own table while the others do the same. Each call
+    returns (success, errors), which are added to stats. An exception in
+    any table stops the import once its level has finished.
+    """
+    for level in IMPORT_LEVELS:
+        with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as executor:
+            futures = []
+            for table_name in level:
+                if not data.counts.get(table_name):
+                    print(f"⏭️  Skipping {table_name} (no data)")
+                    continue
+                futures.append(executor.submit(import_table, table_name, data))
+
+            wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                success, errors = future.result()
+                stats['success'] += success
+                stats['errors'] += errors
 
 
 def import_with_supabase_client(data):
@@ -84,55 +347,192 @@ def import_with_supabase_client(data):
         'skipped': 0
     }
 
-    # Import order matters due to foreign keys
-    import_order = [
-        'platform_users',
-        'invoices',
-        'invoice_items',
-        'spending_limits',
-        'spending_limits_v2'
-    ]
-
-    for table_name in import_order:
-        if table_name not in data or not data[table_name]:
-            print(f"⏭️  Skipping {table_name} (no data)")
-            continue
-
-        records = data[table_name]
-        print(f"\n📦 Importing {len(records)} records to {table_name}...")
-
-        # Import in batches to avoid rate limits
-        batch_size = 100
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i + batch_size]
+    def import_table(table_name, data):
+        records = iter(data[table_name])
+        print(f"\n📦 Importing {data.counts[table_name]} records to {table_name}...")
+        success = errors = 0
+
+        # Import in large batches - each request pays a full HTTP round trip.
+        # returning=minimal stops PostgREST from echoing the rows back.
+        # Records are read from the source one batch at a time; a batch that
+        # was too large is split from pending without reading it again
+        batch_size = SUPABASE_BATCH_SIZE
+        batch_number = 0
+        pending = []
+        while True:
+            pending.extend(islice(records, max(batch_size - len(pending), 0)))
+            if not pending:
+                break
+            batch = pending[:batch_size]
 
             try:
-                response = supabase.table(table_name).insert(batch).execute()
-                stats['success'] += len(batch)
-                print(f"   ✅ Batch {i//batch_size + 1}: {len(batch)} records")
+                supabase.table(table_name).insert(batch, returning=ReturnMethod.minimal).execute()
+                batch_number += 1
+                del pending[:len(batch)]
+                success += len(batch)
+                print(f"   ✅ {table_name} batch {batch_number}: {len(batch)} records")
             except Exception as e:
-                print(f"   ❌ Error in batch {i//batch_size + 1}: {e}")
+                if is_payload_too_large(e) and batch_size > SUPABASE_MIN_BATCH_SIZE:
+                    batch_size = max(batch_size // 2, SUPABASE_MIN_BATCH_SIZE)
+                    print(f"   🔄 {table_name}: request too large, retrying with batches of {batch_size}")
+                    continue
+
+                batch_number += 1
+                del pending[:len(batch)]
+                print(f"   ❌ Error in {table_name} batch {batch_number}: {e}")
 
                 # Try inserting records one by one
                 for record in batch:
                     try:
-                        supabase.table(table_name).insert(record).execute()
-                        stats['success'] += 1
+                        supabase.table(table_name).insert(record, returning=ReturnMethod.minimal).execute()
+                        success += 1
                     except Exception as e2:
-                        print(f"   ⚠️  Failed to import record ID {record.get('id', 'unknown')}: {e2}")
-                        stats['errors'] += 1
+                        print(f"   ⚠️  Failed to import {table_name} record ID {record.get('id', 'unknown')}: {e2}")
+                        errors += 1
 
         print(f"   ✅ Completed {table_name}")
+        return success, errors
 
+    import_by_level(import_table, data, stats)
     return stats
 
 
-def import_with_postgres_direct(data):
-    """Import data using direct PostgreSQL connection (faster)"""
-    print("\n🔌 Using Direct PostgreSQL method...")
+# Columns to import per table, plus the ON CONFLICT clause for tables that
+# may already hold rows
+POSTGRES_TABLES = {
+    'platform_users': {
+        'columns': ['id', 'platform', 'platform_user_id', 'display_name', 'phone_number', 'created_at', 'last_active'],
+        'on_conflict': "ON CONFLICT (platform, platform_user_id) DO NOTHING"
+    },
+    'invoices': {
+        'columns': ['id', 'shop_name', 'invoice_date', 'total_amount', 'transaction_type', 'processed_at', 'image_path']
+    },
+    'invoice_items': {
+        'columns': ['id', 'invoice_id', 'item_name', 'quantity', 'unit_price', 'total_price']
+    },
+    'spending_limits': {
+        'columns': ['user_id', 'monthly_limit', 'created_at', 'updated_at'],
+        'on_conflict': """
+            ON CONFLICT (user_id) DO UPDATE SET
+                monthly_limit = EXCLUDED.monthly_limit,
+                updated_at = EXCLUDED.updated_at
+        """
+    },
+    'spending_limits_v2': {
+        'columns': ['id', 'user_id', 'monthly_limit', 'created_at', 'updated_at']
+    }
+}
+
+
+def drop_secondary_indexes(cursor, tables):
+    """Drop the plain indexes on the given tables, returning their definitions.
+
+    Primary key, unique and other constraint-backed indexes are kept - the
+    upserts rely on them.
+    """
+    cursor.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = 'public'
+          AND t.relname = ANY(%s)
+          AND NOT i.indisprimary
+          AND NOT i.indisunique
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """, (list(tables),))
+    indexes = cursor.fetchall()
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {name}")
+    return indexes
+
+
+def import_table_postgres(table_name, data):
+    """Import one table over its own PostgreSQL connection, returning (success, errors)"""
+    config = POSTGRES_TABLES[table_name]
+    print(f"\n📦 Importing {data.counts[table_name]} records to {table_name}...")
+    success = errors = 0
+
+    columns = config['columns']
+    column_list = ', '.join(columns)
+    on_conflict = config.get('on_conflict', '')
+    prepare_sql = (
+        f"PREPARE import_insert AS INSERT INTO {table_name} ({column_list}) "
+        f"VALUES ({', '.join(f'${n}' for n in range(1, len(columns) + 1))}) {on_conflict}"
+    )
 
     conn = get_postgres_connection()
     cursor = conn.cursor()
+    try:
+        try:
+            # Each table loads in a single transaction; a lost commit on a
+            # server crash only means re-running the migration
+            cursor.execute("SET LOCAL synchronous_commit = OFF")
+
+            # Building each index once after the load is much cheaper than
+            # updating it for every imported row. The drop is part of the
+            # load transaction, so a failed or interrupted load rolls it back
+            # and the table keeps its indexes
+            indexes = drop_secondary_indexes(cursor, [table_name])
+
+            # Stream the whole table through one COPY. COPY has no ON
+            # CONFLICT, so upserts are copied into a staging table that is
+            # then merged with a single INSERT ... SELECT
+            rows = record_rows(data[table_name], columns)
+            if on_conflict:
+                cursor.execute(
+                    f"CREATE TEMP TABLE import_staging ON COMMIT DROP AS "
+                    f"SELECT {column_list} FROM {table_name} WITH NO DATA"
+                )
+                count = copy_rows(cursor, 'import_staging', columns, rows)
+                cursor.execute(
+                    f"INSERT INTO {table_name} ({column_list}) "
+                    f"SELECT {column_list} FROM import_staging {on_conflict}"
+                )
+            else:
+                count = copy_rows(cursor, table_name, columns, rows)
+            for _, definition in indexes:
+                cursor.execute(definition)
+            conn.commit()
+            if indexes:
+                print(f"   🗂️  Rebuilt {len(indexes)} indexes on {table_name}")
+            success += count
+            print(f"   ✅ Imported {count} records to {table_name}")
+        except Exception as e:
+            print(f"   ❌ Error in {table_name}: {e}")
+            conn.rollback()
+
+            # Try one by one, still in one transaction: a savepoint around
+            # each row lets a bad record roll back alone, and the savepoint,
+            # INSERT and release go to the server as a single query. The
+            # INSERT is prepared once so it is not re-parsed for every row.
+            # The records are read from the source again for this pass
+            print(f"   🔄 Retrying {table_name} with individual inserts...")
+            cursor.execute("SET LOCAL synchronous_commit = OFF")
+            cursor.execute(prepare_sql)
+            row_sql = (
+                f"SAVEPOINT import_row; EXECUTE import_insert ({', '.join(['%s'] * len(columns))}); "
+                f"RELEASE SAVEPOINT import_row"
+            )
+            for i, row in enumerate(record_rows(data[table_name], columns)):
+                try:
+                    cursor.execute(row_sql, row)
+                    success += 1
+                except Exception as e2:
+                    print(f"   ⚠️  Failed {table_name} record {i+1}: {e2}")
+                    errors += 1
+                    cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+            conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    return success, errors
+
+
+def import_with_postgres_direct(data):
+    """Import data using direct PostgreSQL connections (faster)"""
+    print("\n🔌 Using Direct PostgreSQL method...")
 
     stats = {
         'success': 0,
@@ -140,85 +540,18 @@ def import_with_postgres_direct(data):
         'skipped': 0
     }
 
-    try:
-        # Import order matters due to foreign keys
-        tables_config = {
-            'platform_users': {
-                'columns': ['id', 'platform', 'platform_user_id', 'display_name', 'phone_number', 'created_at', 'last_active'],
-                'insert_sql': """
-                    INSERT INTO platform_users (id, platform, platform_user_id, display_name, phone_number, created_at, last_active)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (platform, platform_user_id) DO NOTHING
-                """
-            },
-            'invoices': {
-                'columns': ['id', 'shop_name', 'invoice_date', 'total_amount', 'transaction_type', 'processed_at', 'image_path'],
-                'insert_sql': """
-                    INSERT INTO invoices (id, shop_name, invoice_date, total_amount, transaction_type, processed_at, image_path)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
-            },
-            'invoice_items': {
-                'columns': ['id', 'invoice_id', 'item_name', 'quantity', 'unit_price', 'total_price'],
-                'insert_sql': """
-                    INSERT INTO invoice_items (id, invoice_id, item_name, quantity, unit_price, total_price)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """
-            },
-            'spending_limits': {
-                'columns': ['user_id', 'monthly_limit', 'created_at', 'updated_at'],
-                'insert_sql': """
-                    INSERT INTO spending_limits (user_id, monthly_limit, created_at, updated_at)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (user_id) DO UPDATE SET
-                        monthly_limit = EXCLUDED.monthly_limit,
-                        updated_at = EXCLUDED.updated_at
-                """
-            },
-            'spending_limits_v2': {
-                'columns': ['id', 'user_id', 'monthly_limit', 'created_at', 'updated_at'],
-                'insert_sql': """
-                    INSERT INTO spending_limits_v2 (id, user_id, monthly_limit, created_at, updated_at)
-                    VALUES (%s, %s, %s, %s, %s)
-                """
-            }
-        }
-
-        for table_name, config in tables_config.items():
-            if table_name not in data or not data[table_name]:
-                print(f"⏭️  Skipping {table_name} (no data)")
-                continue
-
-            records = data[table_name]
-            print(f"\n📦 Importing {len(records)} records to {table_name}...")
-
-            # Prepare data tuples
-            values = []
-            for record in records:
-                row = tuple(record.get(col) for col in config['columns'])
-                values.append(row)
+    conn = get_postgres_connection()
+    conn.autocommit = True
+    cursor = conn.cursor()
 
-            try:
-                # Use execute_batch for better performance
-                execute_batch(cursor, config['insert_sql'], values, page_size=1000)
-                conn.commit()
-                stats['success'] += len(values)
-                print(f"   ✅ Imported {len(values)} records")
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                conn.rollback()
+    try:
+        import_by_level(import_table_postgres, data, stats)
 
-                # Try one by one
-                print(f"   🔄 Retrying with individual inserts...")
-                for i, row in enumerate(values):
-                    try:
-                        cursor.execute(config['insert_sql'], row)
-                        conn.commit()
-                        stats['success'] += 1
-                    except Exception as e2:
-                        print(f"   ⚠️  Failed record {i+1}: {e2}")
-                        stats['errors'] += 1
-                        conn.rollback()
+        # Fresh planner statistics for the verification queries
+        try:
+            cursor.execute(f"ANALYZE {', '.join(POSTGRES_TABLES)}")
+        except Exception as e:
+            print(f"   ⚠️  Could not analyze tables: {e}")
 
         # Update sequences to continue from the last imported ID
         print("\n🔧 Updating sequences...")
@@ -232,7 +565,6 @@ def import_with_postgres_direct(data):
         for sql, name in sequence_updates:
             try:
                 cursor.execute(sql)
-                conn.commit()
                 print(f"   ✅ Updated sequence for {name}")
             except Exception as e:
                 print(f"   ⚠️  Could not update sequence for {name}: {e}")
@@ -255,19 +587,21 @@ def verify_import():
         # Check record counts
         tables = ['invoices', 'invoice_items', 'platform_users', 'spending_limits', 'spending_limits_v2']
 
+        # All counts in one round trip
+        cursor.execute(" UNION ALL ".join(
+            f"SELECT '{table}', COUNT(*) FROM {table}" for table in tables
+        ))
+
         print("\n📊 Record counts in Supabase:")
-        for table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
+        for table, count in cursor.fetchall():
             print(f"   • {table}: {count}")
 
-        # Check for orphaned records
+        # Check for orphaned records (anti-join)
         cursor.execute("""
             SELECT COUNT(*)
             FROM invoice_items ii
-            WHERE NOT EXISTS (
-                SELECT 1 FROM invoices i WHERE i.id = ii.invoice_id
-            )
+            LEFT JOIN invoices i ON i.id = ii.invoice_id
+            WHERE i.id IS NULL
         """)
         orphaned = cursor.fetchone()[0]
         if orphaned > 0:
@@ -300,8 +634,8 @@ def verify_import():
         return False
 
 
-def main(export_file, method='auto'):
-    """Main import function"""
+def run_import(export_file, method='auto'):
+    """Import an export file (or SQLite database), returning True on success"""
     print("=" * 70)
     print("🚀 Supabase Data Import Tool")
     print("=" * 70)
@@ -309,16 +643,13 @@ def main(export_file, method='auto'):
     # Check if export file exists
     if not os.path.exists(export_file):
         print(f"❌ Error: Export file not found: {export_file}")
-        sys.exit(1)
+        return False
 
     print(f"📁 Import file: {export_file}")
 
     # Load export data
     print("📂 Loading export data...")
-    with open(export_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    total_records = sum(len(records) for records in data.values() if isinstance(records, list))
+    data, total_records = load_export(export_file)
     print(f"✅ Loaded {total_records} total records from {len(data)} tables")
 
     # Choose import method
@@ -357,23 +688,31 @@ def main(export_file, method='auto'):
         print("   2. Update imports in your code to use database_supabase.py")
         print("   3. Test your application thoroughly")
         print("   4. Keep the SQLite backup for rollback if needed")
+        return True
 
     except Exception as e:
         print(f"\n❌ Import failed: {e}")
         import traceback
         traceback.print_exc()
-        sys.exit(1)
+        return False
 
 
-if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python import_to_supabase.py <export_file.json> [method]")
+def main(argv=None):
+    """Command-line entry point, returning an exit code"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python import_to_supabase.py <export_file.json | invoices.db> [method]")
         print("Methods: auto (default), postgres, supabase")
         print("\nExample:")
         print("  python import_to_supabase.py migration/sqlite_export_20240101_120000.json")
-        sys.exit(1)
+        print("  python import_to_supabase.py database/invoices.db  # import without a JSON export")
+        return 1
+
+    export_file = argv[0]
+    method = argv[1] if len(argv) > 1 else 'auto'
 
-    export_file = sys.argv[1]
-    method = sys.argv[2] if len(sys.argv) > 2 else 'auto'
+    return 0 if run_import(export_file, method) else 1
 
-    main(export_file, method)
+
+if __name__ == '__main__':
+    sys.exit(main())
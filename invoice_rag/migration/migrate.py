@@ -2,12 +2,23 @@
 """
 Supabase Migration Helper Script
 Interactive menu to guide through the migration process
+
+Usage:
+    python migrate.py      # Interactive menu
+    python migrate.py -v   # Also list each dependency in the pre-flight check
 """
 import os
 import sys
 import subprocess
+from functools import lru_cache
+from importlib.util import find_spec
 from pathlib import Path
 
+# Fixed locations, resolved once: this directory and the invoice_rag project
+MIGRATION_DIR = Path(__file__).parent
+PROJECT_DIR = MIGRATION_DIR.parent
+ENV_PATH = PROJECT_DIR / '.env'
+
 def print_header(text):
     """Print a formatted header"""
     print("\n" + "=" * 70)
@@ -20,18 +31,33 @@ def print_step(number, text):
     print(f"📍 Step {number}: {text}")
     print('='*70)
 
+@lru_cache(maxsize=1)
+def _parse_env(env_path, mtime_ns):
+    from dotenv import dotenv_values
+    return dotenv_values(env_path)
+
+def load_env():
+    """Return the values in the project .env ({} if it does not exist).
+
+    The file is parsed once and reused until it changes on disk, so menu
+    options can call this freely while the user edits .env in between.
+    """
+    try:
+        mtime_ns = ENV_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _parse_env(ENV_PATH, mtime_ns)
+
 def check_env_file():
     """Check if .env file exists and has Supabase credentials"""
-    env_path = Path(__file__).parent.parent / '.env'
-
-    if not env_path.exists():
+    if not ENV_PATH.exists():
         print("❌ .env file not found!")
-        print(f"   Expected location: {env_path}")
+        print(f"   Expected location: {ENV_PATH}")
         return False
 
-    with open(env_path, 'r') as f:
-        content = f.read()
-        has_supabase = 'SUPABASE_URL' in content and 'SUPABASE_DB_HOST' in content
+    # Parsed, so commented-out keys do not count
+    env = load_env()
+    has_supabase = 'SUPABASE_URL' in env and 'SUPABASE_DB_HOST' in env
 
     if not has_supabase:
         print("⚠️  .env file exists but missing Supabase credentials")
@@ -40,20 +66,19 @@ def check_env_file():
     print("✅ .env file found with Supabase credentials")
     return True
 
-def check_dependencies():
-    """Check if required packages are installed"""
+# Packages needed for the migration (import names)
+REQUIRED_PACKAGES = ('supabase', 'psycopg2', 'sqlalchemy', 'dotenv')
+
+def check_dependencies(verbose=False):
+    """Check if required packages are installed (per-package lines if verbose)"""
     print("\n🔍 Checking dependencies...")
 
-    missing = []
-    packages = ['supabase', 'psycopg2', 'sqlalchemy', 'dotenv']
+    # find_spec only locates each package; nothing is actually imported
+    missing = [package for package in REQUIRED_PACKAGES if find_spec(package) is None]
 
-    for package in packages:
-        try:
-            __import__(package.replace('-', '_'))
-            print(f"   ✅ {package}")
-        except ImportError:
-            print(f"   ❌ {package}")
-            missing.append(package)
+    if verbose:
+        for package in REQUIRED_PACKAGES:
+            print(f"   {'❌' if package in missing else '✅'} {package}")
 
     if missing:
         print(f"\n❌ Missing packages: {', '.join(missing)}")
@@ -63,22 +88,20 @@ def check_dependencies():
     print("\n✅ All dependencies installed")
     return True
 
-def run_command(command, description):
-    """Run a shell command and return success status"""
-    print(f"\n🔄 {description}...")
-    try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error: {e.stderr}")
-        return False
+def latest_export(migration_dir):
+    """Return the path of the newest sqlite_export_*.json in migration_dir, or None.
+
+    Export names embed a sortable timestamp, so the newest file is simply the
+    greatest name; one scandir pass finds it without sorting the directory.
+    """
+    latest = None
+    with os.scandir(migration_dir) as it:
+        for entry in it:
+            name = entry.name
+            if (name.startswith('sqlite_export_') and name.endswith('.json')
+                    and (latest is None or name > latest) and entry.is_file()):
+                latest = name
+    return os.path.join(migration_dir, latest) if latest else None
 
 def show_menu():
     """Display the main menu"""
@@ -103,18 +126,21 @@ def pre_flight_check():
     all_good = True
 
     # Check SQLite database exists
-    db_path = Path(__file__).parent.parent / 'database' / 'invoices.db'
+    db_path = PROJECT_DIR / 'database' / 'invoices.db'
     if db_path.exists():
         print(f"✅ SQLite database found: {db_path}")
 
-        # Get record count
+        # Only check that there is data to migrate - the exact counts are
+        # reported by the export itself. Opened read-only so the probe never
+        # takes a write lock on the live database
         try:
             import sqlite3
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM invoices")
-            count = cursor.fetchone()[0]
-            print(f"   📊 Contains {count} invoices")
+            conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+            has_invoices = conn.execute("SELECT EXISTS (SELECT 1 FROM invoices)").fetchone()[0]
+            if has_invoices:
+                print("   📊 Contains invoice data")
+            else:
+                print("   ⚠️  No invoices to migrate yet")
             conn.close()
         except Exception as e:
             print(f"   ⚠️  Could not read database: {e}")
@@ -123,7 +149,7 @@ def pre_flight_check():
         all_good = False
 
     # Check dependencies
-    if not check_dependencies():
+    if not check_dependencies(verbose='-v' in sys.argv[1:]):
         all_good = False
 
     # Check .env file
@@ -131,12 +157,11 @@ def pre_flight_check():
         all_good = False
 
     # Check migration scripts exist
-    migration_dir = Path(__file__).parent
     scripts = ['export_sqlite_data.py', 'import_to_supabase.py', 'create_schema.sql']
 
     print("\n🔍 Checking migration scripts...")
     for script in scripts:
-        script_path = migration_dir / script
+        script_path = MIGRATION_DIR / script
         if script_path.exists():
             print(f"   ✅ {script}")
         else:
@@ -156,7 +181,7 @@ def export_sqlite():
     """Export SQLite data"""
     print_step(2, "Export SQLite Data")
 
-    script_path = Path(__file__).parent / 'export_sqlite_data.py'
+    script_path = MIGRATION_DIR / 'export_sqlite_data.py'
 
     if not script_path.exists():
         print(f"❌ Export script not found: {script_path}")
@@ -165,18 +190,15 @@ def export_sqlite():
     print("📦 Starting SQLite data export...")
     print()
 
-    success = run_command(
-        f'python "{script_path}"',
-        "Exporting data"
-    )
-
-    if success:
+    # Run the exporter in-process rather than in a new interpreter
+    import export_sqlite_data
+    print("\n🔄 Exporting data...")
+    if export_sqlite_data.main() == 0:
         # Find the most recent export file
-        export_files = sorted(Path(__file__).parent.glob('sqlite_export_*.json'))
-        if export_files:
-            latest = export_files[-1]
-            print(f"\n✅ Export completed: {latest.name}")
-            return str(latest)
+        latest = latest_export(MIGRATION_DIR)
+        if latest:
+            print(f"\n✅ Export completed: {os.path.basename(latest)}")
+            return latest
 
     return False
 
@@ -184,7 +206,7 @@ def import_to_supabase(export_file=None):
     """Import data to Supabase"""
     print_step(3, "Import to Supabase")
 
-    script_path = Path(__file__).parent / 'import_to_supabase.py'
+    script_path = MIGRATION_DIR / 'import_to_supabase.py'
 
     if not script_path.exists():
         print(f"❌ Import script not found: {script_path}")
@@ -192,11 +214,10 @@ def import_to_supabase(export_file=None):
 
     # Find export file if not provided
     if not export_file:
-        export_files = sorted(Path(__file__).parent.glob('sqlite_export_*.json'))
-        if not export_files:
+        export_file = latest_export(MIGRATION_DIR)
+        if not export_file:
             print("❌ No export file found. Run export first.")
             return False
-        export_file = str(export_files[-1])
         print(f"📁 Using export file: {Path(export_file).name}")
 
     print("\n⚠️  IMPORTANT: Before importing, make sure you have:")
@@ -212,30 +233,27 @@ def import_to_supabase(export_file=None):
     print("\n📡 Starting Supabase import...")
     print()
 
-    success = run_command(
-        f'python "{script_path}" "{export_file}"',
-        "Importing data"
-    )
-
-    return success
+    import import_to_supabase as importer
+    print("\n🔄 Importing data...")
+    return importer.main([export_file]) == 0
 
 def verify_migration():
     """Verify migration was successful"""
     print_step(4, "Verify Migration")
 
     try:
-        from dotenv import load_dotenv
         import psycopg2
 
-        load_dotenv()
+        # Variables already set in the environment take precedence over .env
+        env = {**load_env(), **os.environ}
 
         # Connect to Supabase
         conn = psycopg2.connect(
-            host=os.environ.get("SUPABASE_DB_HOST"),
-            port=os.environ.get("SUPABASE_DB_PORT", "5432"),
-            database=os.environ.get("SUPABASE_DB_NAME", "postgres"),
-            user=os.environ.get("SUPABASE_DB_USER", "postgres"),
-            password=os.environ.get("SUPABASE_DB_PASSWORD")
+            host=env.get("SUPABASE_DB_HOST"),
+            port=env.get("SUPABASE_DB_PORT", "5432"),
+            database=env.get("SUPABASE_DB_NAME", "postgres"),
+            user=env.get("SUPABASE_DB_USER", "postgres"),
+            password=env.get("SUPABASE_DB_PASSWORD")
         )
 
         cursor = conn.cursor()
@@ -244,20 +262,21 @@ def verify_migration():
 
         tables = ['invoices', 'invoice_items', 'platform_users', 'spending_limits', 'spending_limits_v2']
 
-        for table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
-            print(f"   • {table:25} {count:6} records")
-
-        # Check for orphaned records
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM invoice_items ii
-            WHERE NOT EXISTS (
-                SELECT 1 FROM invoices i WHERE i.id = ii.invoice_id
-            )
+        # Every count, the orphan check and the invoice total come back in
+        # one row, so verification costs a single round trip
+        counts_sql = ", ".join(f"(SELECT COUNT(*) FROM {table})" for table in tables)
+        cursor.execute(f"""
+            SELECT {counts_sql},
+                (SELECT COUNT(*)
+                 FROM invoice_items ii
+                 LEFT JOIN invoices i ON i.id = ii.invoice_id
+                 WHERE i.id IS NULL),
+                (SELECT SUM(total_amount) FROM invoices)
         """)
-        orphaned = cursor.fetchone()[0]
+        *counts, orphaned, total_amount = cursor.fetchone()
+
+        for table, count in zip(tables, counts):
+            print(f"   • {table:25} {count:6} records")
 
         print()
         if orphaned > 0:
@@ -266,10 +285,8 @@ def verify_migration():
             print("✅ No orphaned records found")
 
         # Check total amount
-        cursor.execute("SELECT SUM(total_amount), COUNT(*) FROM invoices")
-        result = cursor.fetchone()
-        total_amount = result[0] if result[0] else 0
-        invoice_count = result[1]
+        total_amount = total_amount if total_amount else 0
+        invoice_count = counts[0]
 
         print(f"\n💰 Data Summary:")
         print(f"   • Total invoices: {invoice_count}")
@@ -289,7 +306,7 @@ def view_guide():
     """Open the migration guide"""
     print_step(5, "View Migration Guide")
 
-    guide_path = Path(__file__).parent.parent.parent / 'SUPABASE_MIGRATION_GUIDE.md'
+    guide_path = PROJECT_DIR.parent / 'SUPABASE_MIGRATION_GUIDE.md'
 
     if guide_path.exists():
         print(f"📖 Migration guide: {guide_path}")
@@ -312,21 +329,20 @@ def setup_environment():
     """Help setup .env file"""
     print_step(6, "Setup Environment")
 
-    env_path = Path(__file__).parent.parent / '.env'
-    example_path = Path(__file__).parent / '.env.supabase.example'
+    example_path = MIGRATION_DIR / '.env.supabase.example'
 
     print("🔧 Environment Setup")
     print()
 
-    if env_path.exists():
-        print(f"⚠️  .env file already exists: {env_path}")
+    if ENV_PATH.exists():
+        print(f"⚠️  .env file already exists: {ENV_PATH}")
         response = input("Do you want to view/edit it? (y/n): ")
         if response.lower() == 'y':
             try:
                 if sys.platform == 'win32':
-                    os.startfile(env_path)
+                    os.startfile(ENV_PATH)
                 else:
-                    print(f"\nPlease edit: {env_path}")
+                    print(f"\nPlease edit: {ENV_PATH}")
             except Exception as e:
                 print(f"Error: {e}")
         return
@@ -335,8 +351,8 @@ def setup_environment():
 
     if example_path.exists():
         import shutil
-        shutil.copy(example_path, env_path)
-        print(f"✅ Created: {env_path}")
+        shutil.copy(example_path, ENV_PATH)
+        print(f"✅ Created: {ENV_PATH}")
         print()
         print("📋 Next steps:")
         print("   1. Get your Supabase credentials from:")
@@ -349,9 +365,9 @@ def setup_environment():
         if response.lower() == 'y':
             try:
                 if sys.platform == 'win32':
-                    os.startfile(env_path)
+                    os.startfile(ENV_PATH)
                 else:
-                    print(f"\nPlease edit: {env_path}")
+                    print(f"\nPlease edit: {ENV_PATH}")
             except Exception as e:
                 print(f"Error: {e}")
     else:
@@ -4,8 +4,13 @@ Quick Migration Script - One Command to Rule Them All
 Executes the complete migration process from SQLite to Supabase
 """
 import os
+import subprocess
 import sys
-from pathlib import Path
+
+from migrate import latest_export
+
+# Connection test script, next to this file
+TEST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_connection.py')
 
 def print_header(text):
     print("\n" + "=" * 70)
@@ -18,9 +23,20 @@ def print_step(number, text):
     print('='*70)
 
 def run_command(command, description):
-    """Run a shell command"""
+    """Run a command (argument list, no shell)"""
+    print(f"\n🔄 {description}...")
+    result = subprocess.run(command).returncode
+    if result == 0:
+        print(f"✅ {description} completed successfully")
+        return True
+    else:
+        print(f"❌ {description} failed with code {result}")
+        return False
+
+def run_step(step, description):
+    """Run an in-process step that returns an exit code"""
     print(f"\n🔄 {description}...")
-    result = os.system(command)
+    result = step()
     if result == 0:
         print(f"✅ {description} completed successfully")
         return True
@@ -54,31 +70,32 @@ def main():
     
     # Step 1: Test connection
     print_step(1, "Testing Supabase Connection")
-    if not run_command("python migration/test_connection.py", "Connection test"):
+    if not run_command([sys.executable, TEST_SCRIPT], "Connection test"):
         print("\n❌ Connection test failed. Please check your .env credentials.")
         sys.exit(1)
     
     # Step 2: Export SQLite data
     print_step(2, "Exporting SQLite Data")
-    if not run_command("python migration/export_sqlite_data.py", "Data export"):
+    # Export and import run in this interpreter instead of a new process each
+    import export_sqlite_data
+    if not run_step(export_sqlite_data.main, "Data export"):
         print("\n❌ Export failed")
         sys.exit(1)
     
     # Find the latest export file
-    migration_dir = Path("migration")
-    export_files = sorted(migration_dir.glob("sqlite_export_*.json"))
+    export_file = latest_export("migration")
     
-    if not export_files:
+    if not export_file:
         print("❌ No export file found")
         sys.exit(1)
     
-    latest_export = export_files[-1]
-    print(f"\n📁 Using export file: {latest_export.name}")
+    print(f"\n📁 Using export file: {os.path.basename(export_file)}")
     
     # Step 3: Import to Supabase
     print_step(3, "Importing to Supabase")
     # Force 'supabase' method to use REST API instead of direct PostgreSQL (better for firewalls)
-    if not run_command(f'python migration/import_to_supabase.py "{latest_export}" supabase', "Data import"):
+    import import_to_supabase
+    if not run_step(lambda: import_to_supabase.main([export_file, 'supabase']), "Data import"):
         print("\n❌ Import failed")
         sys.exit(1)
     
@@ -5,11 +5,6 @@ Pool size increased to 20, session context managers implemented
 """
 import os
 import sys
-import asyncio
-import nest_asyncio
-
-# Allow nested event loops
-nest_asyncio.apply()
 
 # Add the project root directory to Python path
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -19,7 +14,7 @@ from telegram_bot.bot import main
 
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        main()
     except KeyboardInterrupt:
         print("\nBot stopped by user")
     except Exception as e:
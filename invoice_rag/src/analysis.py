@@ -1,7 +1,39 @@
 import sqlite3
 import os
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta, date
 
+# Applied once to each cached SQLite connection: a 64 MiB page cache,
+# in-memory temp tables for GROUP BY/ORDER BY, and memory-mapped reads
+READ_PRAGMAS = (
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Per-thread SQLite connection reused across analysis queries. The handles
+# are kept open on purpose: there is one per thread that runs analysis (the
+# bot's event loop thread and the asyncio.to_thread workers the chatbot uses
+# for tools), and each is closed when its thread exits and the thread-local
+# storage is released.
+_local = threading.local()
+
+# Date formats found on Indonesian invoices, tried in order:
+# %d/%m/%Y, %d-%m-%Y, %d.%m.%Y, %Y-%m-%d, %d/%m/%y, %d-%m-%y.
+# Compiled once so parsing does not go through strptime for every row;
+# the day group also takes strptime's space-padded single digit
+DATE_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"(?P<d>\d{1,2}| \d)/(?P<m>\d{1,2})/(?P<Y>\d{4})",
+    r"(?P<d>\d{1,2}| \d)-(?P<m>\d{1,2})-(?P<Y>\d{4})",
+    r"(?P<d>\d{1,2}| \d)\.(?P<m>\d{1,2})\.(?P<Y>\d{4})",
+    r"(?P<Y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2}| \d)",
+    r"(?P<d>\d{1,2}| \d)/(?P<m>\d{1,2})/(?P<y>\d{2})",
+    r"(?P<d>\d{1,2}| \d)-(?P<m>\d{1,2})-(?P<y>\d{2})",
+))
+
 # Database path - same as used in other modules
 def get_db_path():
     """Get the database path"""
@@ -25,10 +57,67 @@ def get_placeholder():
     except ImportError:
         return "?"
 
+@contextmanager
+def db_connection():
+    """
+    Context manager yielding a connection for analysis queries.
+
+    SQLite connections are opened once per thread, configured with
+    READ_PRAGMAS and kept for reuse; PostgreSQL connections are opened per
+    call and closed on exit. Inside read_transaction() the transaction's
+    connection is yielded instead.
+    """
+    shared = getattr(_local, 'transaction_conn', None)
+    if shared is not None:
+        yield shared
+        return
+
+    if get_placeholder() != "?":
+        conn = get_db_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = get_db_connection()
+        for pragma in READ_PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+    yield conn
+
+@contextmanager
+def read_transaction():
+    """
+    Context manager running the analysis queries inside the block in one
+    read transaction on one connection.
+
+    A multi-part report then takes its locks once and sees a single
+    consistent snapshot, even if an invoice is saved midway. Nested use
+    joins the outer transaction.
+    """
+    if getattr(_local, 'transaction_conn', None) is not None:
+        yield
+        return
+
+    with db_connection() as conn:
+        if get_placeholder() == "?":
+            conn.execute("BEGIN")
+        else:
+            conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        _local.transaction_conn = conn
+        try:
+            yield
+        finally:
+            _local.transaction_conn = None
+            # Nothing was written - just end the transaction
+            conn.rollback()
+
 def analyze_invoices(weeks_back: int | None = None):
     """Analyze invoices and return summary statistics for a given period."""
-    conn = get_db_connection()
-    try:
+    with db_connection() as conn:
         cursor = conn.cursor()
 
         params = []
@@ -41,63 +130,50 @@ def analyze_invoices(weeks_back: int | None = None):
             where_clause = f"WHERE invoice_date >= {placeholder}"
             params.append(start_date.strftime('%Y-%m-%d'))
 
-        # Get basic stats
-        query = f"""
-            SELECT 
-                COUNT(*) as total_invoices,
-                SUM(total_amount) as total_spent,
-                AVG(total_amount) as average_amount
-            FROM invoices
-            {where_clause}
-        """
-        cursor.execute(query, params)
-        
-        result = cursor.fetchone()
-        if not result or result[0] == 0:
-            return {
-                'total_invoices': 0,
-                'total_spent': 0.0,
-                'average_amount': 0.0,
-                'top_vendors': []
-            }
-        
-        total_invoices, total_spent, average_amount = result
-        
-        # Calculate top vendors (shops)
-        vendor_where_clause = "WHERE shop_name IS NOT NULL"
-        if where_clause:
-            vendor_where_clause = f"{where_clause} AND shop_name IS NOT NULL"
-
+        # One grouped query gives both the vendor ranking and, summed over
+        # all groups, the period totals
         query = f"""
             SELECT 
                 shop_name,
                 SUM(total_amount) as total,
                 COUNT(*) as transaction_count
             FROM invoices 
-            {vendor_where_clause}
+            {where_clause}
             GROUP BY shop_name 
             ORDER BY total DESC
-            LIMIT 10
         """
         cursor.execute(query, params)
-        
-        top_vendors = []
-        for row in cursor.fetchall():
-            top_vendors.append({
-                'name': row[0],
-                'total': float(row[1]) if row[1] is not None else 0.0,
-                'transaction_count': row[2]
-            })
-        
+        rows = cursor.fetchall()
+    
+    if not rows:
         return {
-            'total_invoices': total_invoices or 0,
-            'total_spent': float(total_spent) if total_spent is not None else 0.0,
-            'average_amount': float(average_amount) if average_amount is not None else 0.0,
-            'top_vendors': top_vendors
+            'total_invoices': 0,
+            'total_spent': 0.0,
+            'average_amount': 0.0,
+            'top_vendors': []
         }
     
-    finally:
-        conn.close()
+    total_invoices = 0
+    total_spent = 0.0
+    top_vendors = []
+    for shop_name, total, count in rows:
+        total = float(total) if total is not None else 0.0
+        total_invoices += count
+        total_spent += total
+        # Top 10 vendors (shops), skipping invoices without a shop name
+        if shop_name is not None and len(top_vendors) < 10:
+            top_vendors.append({
+                'name': shop_name,
+                'total': total,
+                'transaction_count': count
+            })
+    
+    return {
+        'total_invoices': total_invoices,
+        'total_spent': total_spent,
+        'average_amount': total_spent / total_invoices,
+        'top_vendors': top_vendors
+    }
 
 def parse_invoice_date(date_str):
     """Parse various date formats from Indonesian invoices. Handles both strings and date objects."""
@@ -116,64 +192,72 @@ def parse_invoice_date(date_str):
     if not isinstance(date_str, str):
         return None
     
-    # Common date formats for string parsing
-    formats = [
-        "%d/%m/%Y",
-        "%d-%m-%Y", 
-        "%d.%m.%Y",
-        "%Y-%m-%d",
-        "%d/%m/%y",
-        "%d-%m-%y"
-    ]
-    
-    for fmt in formats:
+    return _parse_date_string(date_str)
+
+@lru_cache(maxsize=4096)
+def _parse_date_string(date_str):
+    """Parse a date string against DATE_PATTERNS (results are memoized, as
+    the same invoice dates repeat across rows and calls)."""
+    # Fast path for ISO dates, the format stored by the processor
+    if len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-':
+        try:
+            return datetime.fromisoformat(date_str)
+        except ValueError:
+            pass
+    
+    for pattern in DATE_PATTERNS:
+        match = pattern.fullmatch(date_str)
+        if not match:
+            continue
+        parts = match.groupdict()
+        if 'Y' in parts:
+            year = int(parts['Y'])
+        else:
+            # Two-digit years follow strptime's %y: 69-99 -> 19xx, 00-68 -> 20xx
+            year = int(parts['y'])
+            year += 1900 if year >= 69 else 2000
         try:
-            return datetime.strptime(date_str, fmt)
+            return datetime(year, int(parts['m']), int(parts['d']))
         except ValueError:
             continue
     
     return None
 
-def get_weekly_data(weeks_back=4):
-    """Get invoice data for the last N weeks."""
-    conn = get_db_connection()
-    try:
+def fetch_daily_buckets(weeks_back=4):
+    """
+    Get per-day spending totals for the last N weeks.
+
+    The grouping runs in the database, so one row per invoice_date is
+    transferred instead of one row per invoice. Returns a list of
+    (invoice_date, total, count) tuples ordered by the stored invoice_date.
+    That order is not necessarily chronological: dates the processor could
+    not normalize are kept as written (e.g. "7/10/2026") and sort as text,
+    so callers key and sort on the parsed date.
+    """
+    with db_connection() as conn:
         cursor = conn.cursor()
         placeholder = get_placeholder()
         
-        end_date = datetime.now()
-        start_date = end_date - timedelta(weeks=weeks_back)
+        start_date = datetime.now() - timedelta(weeks=weeks_back)
         
-        # Get invoices from the last N weeks
         cursor.execute(f"""
-            SELECT id, shop_name, invoice_date, total_amount, transaction_type, processed_at, image_path
+            SELECT invoice_date, SUM(total_amount), COUNT(*)
             FROM invoices
             WHERE invoice_date >= {placeholder}
-            ORDER BY invoice_date DESC
+            GROUP BY invoice_date
+            ORDER BY invoice_date
         """, (start_date.strftime('%Y-%m-%d'),))
         
-        weekly_invoices = []
-        for row in cursor.fetchall():
-            weekly_invoices.append({
-                'id': row[0],
-                'shop_name': row[1],
-                'invoice_date': row[2],
-                'total_amount': float(row[3]) if row[3] is not None else 0.0,
-                'transaction_type': row[4],
-                'processed_at': datetime.fromisoformat(row[5]) if row[5] else None,
-                'image_path': row[6]
-            })
-        
-        return weekly_invoices
-    
-    finally:
-        conn.close()
+        return [
+            (row[0], float(row[1]) if row[1] is not None else 0.0, row[2])
+            for row in cursor.fetchall()
+        ]
 
 def calculate_daily_totals(weeks_back=4):
     """Calculate daily spending totals."""
-    invoices = get_weekly_data(weeks_back)
+    buckets = fetch_daily_buckets(weeks_back)
     
-    if not invoices:
+    if not buckets:
         return {
             'total_days': weeks_back * 7,
             'daily_average': 0,
@@ -182,11 +266,15 @@ def calculate_daily_totals(weeks_back=4):
             'daily_breakdown': {}
         }
     
-    # Group by day
+    # Group by day; period totals are accumulated in the same pass
     daily_totals = {}
+    total_spent = 0.0
+    transaction_count = 0
     
-    for invoice in invoices:
-        date_to_use = parse_invoice_date(invoice['invoice_date'])
+    for invoice_date, total, count in buckets:
+        total_spent += total
+        transaction_count += count
+        date_to_use = parse_invoice_date(invoice_date)
         if date_to_use:
             day_key = date_to_use.strftime("%Y-%m-%d")
             
@@ -198,11 +286,8 @@ def calculate_daily_totals(weeks_back=4):
                     'label': date_to_use.strftime('%d/%m')
                 }
                 
-            daily_totals[day_key]['total'] += invoice['total_amount']
-            daily_totals[day_key]['count'] += 1
-    
-    total_spent = sum(invoice['total_amount'] for invoice in invoices)
-    transaction_count = len(invoices)
+            daily_totals[day_key]['total'] += total
+            daily_totals[day_key]['count'] += count
     
     days_with_data = len(daily_totals)
     daily_average = total_spent / max(days_with_data, 1) if days_with_data > 0 else 0
@@ -218,25 +303,27 @@ def calculate_daily_totals(weeks_back=4):
 
 def calculate_weekly_averages(weeks_back=4):
     """Calculate weekly spending averages."""
-    invoices = get_weekly_data(weeks_back)
+    buckets = fetch_daily_buckets(weeks_back)
     
-    if not invoices:
+    if not buckets:
         return {
             'total_weeks': weeks_back,
             'weekly_average': 0,
             'daily_average': 0,
             'total_spent': 0,
             'transaction_count': 0,
-            'weekly_breakdown': {},
-            'weekly_transaction_counts': {}
+            'weekly_breakdown': {}
         }
     
-    # Group by week
+    # Group by week; period totals are accumulated in the same pass
     weekly_totals = {}
-    weekly_counts = {}
+    total_spent = 0.0
+    transaction_count = 0
     
-    for invoice in invoices:
-        date_to_use = parse_invoice_date(invoice['invoice_date'])
+    for invoice_date, total, count in buckets:
+        total_spent += total
+        transaction_count += count
+        date_to_use = parse_invoice_date(invoice_date)
         if date_to_use:
             # Use invoice_date for week calculation
             week_start = date_to_use - timedelta(days=date_to_use.weekday())
@@ -250,11 +337,8 @@ def calculate_weekly_averages(weeks_back=4):
                     'range': f"{week_start.strftime('%d/%m')}-{week_end.strftime('%d/%m')}"
                 }
                 
-            weekly_totals[week_key]['total'] += invoice['total_amount']
-            weekly_totals[week_key]['count'] += 1
-    
-    total_spent = sum(invoice['total_amount'] for invoice in invoices)
-    transaction_count = len(invoices)
+            weekly_totals[week_key]['total'] += total
+            weekly_totals[week_key]['count'] += count
     
     weeks_with_data = len(weekly_totals)
     weekly_average = total_spent / max(weeks_with_data, 1)
@@ -267,8 +351,7 @@ def calculate_weekly_averages(weeks_back=4):
         'daily_average': daily_average,
         'total_spent': total_spent,
         'transaction_count': transaction_count,
-        'weekly_breakdown': weekly_totals,
-        'weekly_transaction_counts': weekly_counts
+        'weekly_breakdown': weekly_totals
     }
 
 def determine_time_granularity(weeks_back=4):
@@ -278,9 +361,9 @@ def determine_time_granularity(weeks_back=4):
     Returns:
         dict with keys: 'granularity' ('daily' or 'weekly'), 'reason', 'data_range_days'
     """
-    invoices = get_weekly_data(weeks_back)
+    buckets = fetch_daily_buckets(weeks_back)
     
-    if not invoices:
+    if not buckets:
         return {
             'granularity': 'daily',
             'reason': 'no_data',
@@ -290,8 +373,8 @@ def determine_time_granularity(weeks_back=4):
     
     # Find date range
     dates = []
-    for invoice in invoices:
-        date_to_use = parse_invoice_date(invoice['invoice_date'])
+    for invoice_date, _, _ in buckets:
+        date_to_use = parse_invoice_date(invoice_date)
         if date_to_use:
             dates.append(date_to_use)
     
@@ -372,9 +455,14 @@ def analyze_daily_trends(weeks_back=4):
         'message': f'Spending is {trend} ({trend_percentage:+.1f}% change)'
     }
 
-def analyze_spending_trends(weeks_back=4):
-    """Analyze spending trends over time."""
-    weekly_data = calculate_weekly_averages(weeks_back)
+def analyze_spending_trends(weeks_back=4, weekly_data=None):
+    """Analyze spending trends over time.
+
+    Reuses ``weekly_data`` (from calculate_weekly_averages) when the caller
+    already has it.
+    """
+    if weekly_data is None:
+        weekly_data = calculate_weekly_averages(weeks_back)
     weekly_breakdown = weekly_data['weekly_breakdown']
     
     if len(weekly_breakdown) < 2:
@@ -419,164 +507,163 @@ def analyze_spending_trends(weeks_back=4):
 
 def find_biggest_spending_categories(weeks_back=4):
     """Find biggest spending by shop/category."""
-    invoices = get_weekly_data(weeks_back)
-    
-    if not invoices:
-        return {
-            'by_shop': [],
-            'by_amount': [],
-            'highest_single_transaction': None
-        }
-    
-    # Group by shop
-    shop_totals = {}
-    
-    for invoice in invoices:
-        shop_name = invoice['shop_name'] or 'Unknown'
-        if shop_name not in shop_totals:
-            shop_totals[shop_name] = {
-                'total': 0,
-                'count': 0,
-                'invoices': []
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        placeholder = get_placeholder()
+        
+        start_date = datetime.now() - timedelta(weeks=weeks_back)
+        params = (start_date.strftime('%Y-%m-%d'),)
+        
+        # Group by shop in the database; blank and missing names count as 'Unknown'
+        cursor.execute(f"""
+            SELECT
+                COALESCE(NULLIF(shop_name, ''), 'Unknown') AS shop,
+                SUM(total_amount) AS total,
+                COUNT(*) AS transaction_count
+            FROM invoices
+            WHERE invoice_date >= {placeholder}
+            GROUP BY COALESCE(NULLIF(shop_name, ''), 'Unknown')
+            ORDER BY total DESC
+        """, params)
+        shop_rows = cursor.fetchall()
+        
+        if not shop_rows:
+            return {
+                'by_shop': [],
+                'by_amount': [],
+                'highest_single_transaction': None
             }
         
-        shop_totals[shop_name]['total'] += invoice['total_amount']
-        shop_totals[shop_name]['count'] += 1
-        shop_totals[shop_name]['invoices'].append(invoice)
+        # Only the 10 largest transactions are needed
+        cursor.execute(f"""
+            SELECT shop_name, total_amount, invoice_date
+            FROM invoices
+            WHERE invoice_date >= {placeholder}
+            ORDER BY total_amount DESC, invoice_date DESC
+            LIMIT 10
+        """, params)
+        amount_rows = cursor.fetchall()
     
-    # Sort by total spending
     by_shop = []
-    for shop, data in shop_totals.items():
+    for shop, total, count in shop_rows:
+        total = float(total) if total is not None else 0.0
         by_shop.append({
             'shop_name': shop,
-            'total_amount': data['total'],
-            'transaction_count': data['count'],
-            'average_per_transaction': data['total'] / data['count']
+            'total_amount': total,
+            'transaction_count': count,
+            'average_per_transaction': total / count
         })
     
-    by_shop.sort(key=lambda x: x['total_amount'], reverse=True)
-    
-    # Sort all transactions by amount
     by_amount = []
-    for invoice in invoices:
+    for shop_name, amount, invoice_date in amount_rows:
         by_amount.append({
-            'shop_name': invoice['shop_name'] or 'Unknown',
-            'amount': invoice['total_amount'],
-            'date': invoice['invoice_date'] or 'Unknown',
-            'invoice_date': invoice['invoice_date'] or 'Unknown'
+            'shop_name': shop_name or 'Unknown',
+            'amount': float(amount) if amount is not None else 0.0,
+            'date': invoice_date or 'Unknown',
+            'invoice_date': invoice_date or 'Unknown'
         })
     
-    by_amount.sort(key=lambda x: x['amount'], reverse=True)
-    
     highest_single = by_amount[0] if by_amount else None
     
     return {
         'by_shop': by_shop,
-        'by_amount': by_amount[:10],  # Top 10 transactions
+        'by_amount': by_amount,  # Top 10 transactions
         'highest_single_transaction': highest_single
     }
 
 def analyze_item_spending(weeks_back=4):
     """Analyze spending by individual items."""
-    invoices = get_weekly_data(weeks_back)
-    
-    if not invoices:
-        return {
-            'top_items': [],
-            'total_items': 0
-        }
-    
-    # Get items for all invoices in the period
-    conn = get_db_connection()
-    try:
+    with db_connection() as conn:
         cursor = conn.cursor()
+        placeholder = get_placeholder()
         
-        # Get all items for invoices in the time period
-        invoice_ids = [str(inv['id']) for inv in invoices]
-        if not invoice_ids:
-            return {
-                'top_items': [],
-                'total_items': 0
-            }
+        start_date = datetime.now() - timedelta(weeks=weeks_back)
+        params = (start_date.strftime('%Y-%m-%d'),)
         
-        placeholders = ','.join(['?'] * len(invoice_ids))
+        # Aggregate items per (item, shop) in the database, joining on the
+        # period filter instead of passing every invoice id as a parameter
         cursor.execute(f"""
-            SELECT 
+            SELECT
                 ii.item_name,
-                ii.quantity,
-                ii.unit_price,
-                ii.total_price,
-                i.shop_name
+                COALESCE(NULLIF(i.shop_name, ''), 'Unknown') AS shop,
+                SUM(COALESCE(ii.total_price, 0)) AS total,
+                SUM(COALESCE(NULLIF(ii.quantity, 0), 1)) AS quantity
             FROM invoice_items ii
             JOIN invoices i ON ii.invoice_id = i.id
-            WHERE ii.invoice_id IN ({placeholders})
-        """, invoice_ids)
+            WHERE i.invoice_date >= {placeholder}
+            GROUP BY ii.item_name, COALESCE(NULLIF(i.shop_name, ''), 'Unknown')
+        """, params)
+        rows = cursor.fetchall()
         
-        item_totals = {}
-        
-        for row in cursor.fetchall():
-            item_name, quantity, unit_price, total_price, shop_name = row
-            
-            if item_name not in item_totals:
-                item_totals[item_name] = {
-                    'total': 0,
-                    'count': 0,
-                    'shops': set()
+        if not rows:
+            cursor.execute(f"""
+                SELECT 1 FROM invoices WHERE invoice_date >= {placeholder} LIMIT 1
+            """, params)
+            if cursor.fetchone() is None:
+                return {
+                    'top_items': [],
+                    'total_items': 0
                 }
-            
-            item_totals[item_name]['total'] += total_price or 0
-            item_totals[item_name]['count'] += quantity or 1
-            item_totals[item_name]['shops'].add(shop_name or 'Unknown')
-        
-        # Convert to list and sort
-        top_items = []
-        for item_name, data in item_totals.items():
-            avg_price = data['total'] / data['count'] if data['count'] > 0 else 0
-            top_items.append({
-                'item_name': item_name,
-                'total_spent': data['total'],
-                'quantity_bought': data['count'],
-                'average_price': avg_price,
-                'shops_bought_from': list(data['shops'])
-            })
-        
-        top_items.sort(key=lambda x: x['total_spent'], reverse=True)
+    
+    item_totals = {}
+    
+    for item_name, shop_name, total, quantity in rows:
+        if item_name not in item_totals:
+            item_totals[item_name] = {
+                'total': 0,
+                'count': 0,
+                'shops': set()
+            }
         
-        return {
-            'top_items': top_items[:20],  # Top 20 items
-            'total_unique_items': len(item_totals)
-        }
+        item_totals[item_name]['total'] += float(total)
+        item_totals[item_name]['count'] += quantity
+        item_totals[item_name]['shops'].add(shop_name)
+    
+    # Convert to list and sort
+    top_items = []
+    for item_name, data in item_totals.items():
+        avg_price = data['total'] / data['count'] if data['count'] > 0 else 0
+        top_items.append({
+            'item_name': item_name,
+            'total_spent': data['total'],
+            'quantity_bought': data['count'],
+            'average_price': avg_price,
+            'shops_bought_from': list(data['shops'])
+        })
     
-    finally:
-        conn.close()
+    top_items.sort(key=lambda x: x['total_spent'], reverse=True)
+    
+    return {
+        'top_items': top_items[:20],  # Top 20 items
+        'total_unique_items': len(item_totals)
+    }
 
 def analyze_transaction_types(weeks_back=4):
     """Analyze spending by transaction type (bank, retail, e-commerce)."""
-    invoices = get_weekly_data(weeks_back)
-    
-    if not invoices:
-        return {
-            'by_type': [],
-            'total_by_type': {}
-        }
-    
-    type_totals = {}
-    type_counts = {}
-    
-    for invoice in invoices:
-        trans_type = invoice['transaction_type'] or 'unknown'
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        placeholder = get_placeholder()
         
-        if trans_type not in type_totals:
-            type_totals[trans_type] = 0
-            type_counts[trans_type] = 0
-            
-        type_totals[trans_type] += invoice['total_amount']
-        type_counts[trans_type] += 1
+        start_date = datetime.now() - timedelta(weeks=weeks_back)
+        
+        # Group by type in the database; missing types count as 'unknown'
+        cursor.execute(f"""
+            SELECT
+                COALESCE(NULLIF(transaction_type, ''), 'unknown') AS trans_type,
+                SUM(total_amount) AS total,
+                COUNT(*) AS transaction_count
+            FROM invoices
+            WHERE invoice_date >= {placeholder}
+            GROUP BY COALESCE(NULLIF(transaction_type, ''), 'unknown')
+            ORDER BY total DESC
+        """, (start_date.strftime('%Y-%m-%d'),))
+        rows = cursor.fetchall()
     
-    # Convert to list format
     by_type = []
-    for trans_type, total in type_totals.items():
-        count = type_counts[trans_type]
+    type_totals = {}
+    for trans_type, total, count in rows:
+        total = float(total) if total is not None else 0.0
+        type_totals[trans_type] = total
         by_type.append({
             'transaction_type': trans_type,
             'total_amount': total,
@@ -584,8 +671,6 @@ def analyze_transaction_types(weeks_back=4):
             'average_per_transaction': total / count if count > 0 else 0
         })
     
-    by_type.sort(key=lambda x: x['total_amount'], reverse=True)
-    
     return {
         'by_type': by_type,
         'total_by_type': type_totals
@@ -593,11 +678,13 @@ def analyze_transaction_types(weeks_back=4):
 
 def generate_comprehensive_analysis(weeks_back=4):
     """Generate a comprehensive financial analysis."""
-    weekly_avg = calculate_weekly_averages(weeks_back)
-    trends = analyze_spending_trends(weeks_back)
-    spending_cats = find_biggest_spending_categories(weeks_back)
-    item_analysis = analyze_item_spending(weeks_back)
-    transaction_types = analyze_transaction_types(weeks_back)
+    # All parts of the report read the same snapshot over one connection
+    with read_transaction():
+        weekly_avg = calculate_weekly_averages(weeks_back)
+        trends = analyze_spending_trends(weeks_back, weekly_data=weekly_avg)
+        spending_cats = find_biggest_spending_categories(weeks_back)
+        item_analysis = analyze_item_spending(weeks_back)
+        transaction_types = analyze_transaction_types(weeks_back)
     
     return {
         'period': f'Last {weeks_back} weeks',
@@ -1,6 +1,7 @@
 import os
 import json
-from groq import Groq
+import asyncio
+from groq import AsyncGroq
 from dotenv import load_dotenv
 from typing import List, Dict, Any, cast, Iterable
 from groq.types.chat.chat_completion_message_param import ChatCompletionMessageParam
@@ -22,7 +23,8 @@ groq_api_key = os.environ.get("GROQ_API_KEY")
 if not groq_api_key:
     raise ValueError("GROQ_API_KEY not found in environment variables")
 
-client = Groq(api_key=groq_api_key)
+# Async client shared by all conversations so its connection pool is reused
+client = AsyncGroq(api_key=groq_api_key)
 
 # Model configuration
 CHAT_MODEL = os.environ.get("CHAT_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
@@ -253,10 +255,37 @@ AVAILABLE_FUNCTIONS = {
 }
 
 
-def run_conversation(user_message: str, chat_history: List[Dict[str, Any]] | None = None) -> str:
+async def call_tool(tool_call) -> Dict[str, Any]:
+    """Run one requested tool in a worker thread and return its tool message."""
+    function_name = tool_call.function.name
+    function_to_call = AVAILABLE_FUNCTIONS.get(function_name)
+
+    if not function_to_call:
+        # Handle case where function is not found
+        return {
+            "tool_call_id": tool_call.id,
+            "role": "tool",
+            "name": function_name,
+            "content": f'{{"error": "Function {function_name} not found."}}',
+        }
+
+    function_args = json.loads(tool_call.function.arguments)
+
+    # The analysis functions do blocking database work - keep it off the event loop
+    function_response = await asyncio.to_thread(function_to_call, **function_args)
+
+    return {
+        "tool_call_id": tool_call.id,
+        "role": "tool",
+        "name": function_name,
+        "content": json.dumps(function_response, indent=2),
+    }
+
+
+async def run_conversation(user_message: str, chat_history: List[Dict[str, Any]] | None = None) -> str:
     """
     Runs a conversation with the LLM, including multi-turn function calling.
-    Supports calling multiple tools sequentially for complex queries.
+    Tool calls requested in the same turn run concurrently.
     """
     if chat_history is None:
         chat_history = []
@@ -270,7 +299,7 @@ def run_conversation(user_message: str, chat_history: List[Dict[str, Any]] | Non
     try:
         for iteration in range(MAX_ITERATIONS):
             # API call to get response (may include tool calls)
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=CHAT_MODEL,
                 messages=cast(Iterable[ChatCompletionMessageParam], messages),
                 tools=cast(Iterable[ChatCompletionToolParam], tools),
@@ -287,36 +316,9 @@ def run_conversation(user_message: str, chat_history: List[Dict[str, Any]] | Non
             # Model wants to call functions
             messages.append(response_message.model_dump(exclude_unset=True))
 
-            # Execute all tool calls
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_to_call = AVAILABLE_FUNCTIONS.get(function_name)
-
-                if function_to_call:
-                    function_args = json.loads(tool_call.function.arguments)
-
-                    # Call the function with arguments
-                    function_response = function_to_call(**function_args)
-
-                    # Append the function response to the conversation
-                    messages.append(
-                        {
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": function_name,
-                            "content": json.dumps(function_response, indent=2),
-                        }
-                    )
-                else:
-                    # Handle case where function is not found
-                    messages.append(
-                        {
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": function_name,
-                            "content": f'{{"error": "Function {function_name} not found."}}',
-                        }
-                    )
+            # Execute all tool calls concurrently; gather keeps the results
+            # in the order the model requested them
+            messages.extend(await asyncio.gather(*(call_tool(tool_call) for tool_call in tool_calls)))
 
             # Continue loop to let model process tool results
 
@@ -329,7 +331,7 @@ def run_conversation(user_message: str, chat_history: List[Dict[str, Any]] | Non
 
 
 # Example of how to use it
-if __name__ == "__main__":
+async def _demo():
     # Simulate a conversation
     chat_history: List[Dict[str, Any]] = []
 
@@ -340,7 +342,7 @@ if __name__ == "__main__":
     print(f"User: {user_input}")
 
     # Get chatbot response
-    response_text = run_conversation(user_input, chat_history)
+    response_text = await run_conversation(user_input, chat_history)
     print(f"Chatbot: {response_text}")
 
     # Update history
@@ -352,5 +354,9 @@ if __name__ == "__main__":
     user_input = "Show me my spending trend for the last 4 weeks."
     print(f"User: {user_input}")
 
-    response_text = run_conversation(user_input, chat_history)
+    response_text = await run_conversation(user_input, chat_history)
     print(f"Chatbot: {response_text}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -438,6 +438,26 @@ Return ONLY the JSON, no explanations."""
         return None
 
 
+# SQLite indexes for the reporting queries (vendor totals, transaction-type
+# counts, date-range filters). Supabase gets its indexes from create_schema.sql.
+# idx_invoices_date_shop_amount covers the period queries in src/analysis.py
+# (date filter plus shop/amount grouping) without touching the table rows;
+# idx_invoice_items_invoice_id serves the items-to-invoices join.
+SQLITE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_invoices_shop_amount ON invoices(shop_name, total_amount)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_transaction_type ON invoices(transaction_type)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_date_shop_amount ON invoices(invoice_date, shop_name, total_amount)",
+    "CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice_id ON invoice_items(invoice_id)",
+)
+
+
+def create_indexes(cursor):
+    """Create the SQLite reporting indexes if they don't exist."""
+    for statement in SQLITE_INDEXES:
+        cursor.execute(statement)
+
+
 def create_tables():
     """Create database tables if they don't exist - supports both SQLite and Supabase."""
     try:
@@ -484,6 +504,8 @@ def create_tables():
         """
         )
 
+        create_indexes(cursor)
+
         conn.commit()
         conn.close()
     except ImportError:
@@ -521,6 +543,8 @@ def create_tables():
         """
         )
         
+        create_indexes(cursor)
+        
         conn.commit()
         conn.close()
 
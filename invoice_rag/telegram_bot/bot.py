@@ -3,7 +3,6 @@ from telegram.ext import Application, CommandHandler, MessageHandler, ContextTyp
 import os
 from dotenv import load_dotenv
 import sys
-import asyncio
 import logging
 from pathlib import Path
 import pandas as pd
@@ -348,7 +347,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     # Get chatbot response
     sent_message = await message.reply_text("🤔 Typing...", parse_mode='Markdown')
-    response_text = run_conversation(user_message, chat_history)
+    response_text = await run_conversation(user_message, chat_history)
     
     # Update the "Typing..." message with the actual response
     if sent_message and sent_message.message_id:
@@ -544,7 +543,7 @@ async def chat_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     sent_message = await update.message.reply_text("🤔 Thinking...", parse_mode='Markdown')
     
     # Get chatbot response
-    response_text = run_conversation(user_message, chat_history)
+    response_text = await run_conversation(user_message, chat_history)
     
     # Update the typing message with actual response
     if sent_message and sent_message.message_id:
@@ -952,8 +951,12 @@ async def handle_token_claim(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 "Please check your token and try again with /premium"
             )
 
-async def main() -> None:
-    """Start the bot."""
+def main() -> None:
+    """Start the bot.
+
+    A plain function: run_polling() creates and runs its own event loop,
+    so it must not be called from inside a running one.
+    """
     import logging
     
     # Configure logging
@@ -1050,4 +1053,4 @@ async def main() -> None:
         logger.info("Bot stopped and cleaned up")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
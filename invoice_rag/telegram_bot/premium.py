@@ -3,6 +3,7 @@ Premium Feature Management Module
 Handles JWT validation, token claims, and premium subscription management
 """
 import os
+import time
 import jwt
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, Any, Tuple
@@ -247,13 +248,14 @@ def require_premium(session, telegram_user_id: str) -> Tuple[bool, str]:
         )
 
 # Generate JWT token (for testing/admin purposes)
-def generate_test_token(duration_days: int = 7) -> str:
+def generate_test_token(duration_days: int = 7, nonce: Optional[int] = None) -> str:
     """
     Generate a test JWT token with specified duration.
     FOR TESTING ONLY - Should be generated by payment/admin system in production.
     
     Args:
         duration_days: Number of days for premium access
+        nonce: Optional counter added to the token ID, for generating batches
     
     Returns:
         JWT token string
@@ -261,9 +263,14 @@ def generate_test_token(duration_days: int = 7) -> str:
     now = datetime.now(timezone.utc)
     expiry = now + timedelta(days=duration_days)
     
+    # iat only has one-second resolution, so a nanosecond token ID keeps
+    # tokens generated in the same second unique
+    jti = f'{time.time_ns():x}' if nonce is None else f'{time.time_ns():x}-{nonce}'
+    
     payload = {
         'exp': int(expiry.timestamp()),
         'iat': int(now.timestamp()),
+        'jti': jti,
         'duration': f'{duration_days} days',
         'purpose': 'premium_claim'
     }
@@ -3,12 +3,59 @@ pytest configuration file for the test suite.
 
 This configuration ensures that the src/ module can be properly imported
 in all test files without needing to modify sys.path in each test file.
+It also provides the temporary invoices database shared by the tests.
 """
 
+import sqlite3
 import sys
 from pathlib import Path
 
+import pytest
+
 # Add the parent directory (invoice_rag/) to the Python path
 # This allows imports like 'from src.database import ...'
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
+
+
+@pytest.fixture
+def invoice_db(tmp_path, monkeypatch):
+    """Point the app at an empty invoices database in tmp_path, returning its path.
+
+    The tables come from processor.create_tables, so the tests run against
+    the schema the bot itself creates.
+    """
+    import src.database
+    from src.processor import create_tables
+
+    db_path = str(tmp_path / "invoices.db")
+    monkeypatch.setattr(src.database, 'get_default_db_path', lambda: db_path)
+    create_tables()
+    return db_path
+
+
+@pytest.fixture
+def add_invoices(invoice_db):
+    """Return a function inserting invoices into the invoice_db database.
+
+    Each invoice is a dict of invoices columns, plus an optional 'items'
+    list of invoice_items column dicts.
+    """
+    conn = sqlite3.connect(invoice_db)
+
+    def insert(table, row):
+        columns = ', '.join(row)
+        placeholders = ', '.join('?' * len(row))
+        return conn.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", tuple(row.values()))
+
+    def add(invoices):
+        for invoice in invoices:
+            invoice = dict(invoice)
+            items = invoice.pop('items', ())
+            invoice_id = insert('invoices', invoice).lastrowid
+            for item in items:
+                insert('invoice_items', {'invoice_id': invoice_id, **item})
+        conn.commit()
+
+    yield add
+    conn.close()
@@ -3,6 +3,12 @@ Test script to demonstrate the adaptive time granularity feature.
 This script tests how the dashboard adapts between daily and weekly trends based on data range.
 """
 
+import threading
+from datetime import date, datetime
+
+import pytest
+
+from src import analysis
 from src.analysis import determine_time_granularity, calculate_daily_totals, calculate_weekly_averages
 
 def test_adaptive_granularity():
@@ -51,5 +57,160 @@ def test_adaptive_granularity():
     print("  - Dashboard automatically adapts to show the most informative view")
     print("=" * 60)
 
+# Invoice dates are fixed in the future so every weeks_back window includes
+# them. The period filter compares invoice_date as text, so the d/m/Y dates
+# (stored when the processor could not normalize them) start with a digit
+# above 2. 2099-10-05 is a Monday.
+PERIOD_DATE = '2099-10-05'
+OLD_DATE = '2020-01-06'
+
+@pytest.fixture
+def analysis_db(add_invoices, monkeypatch):
+    """Run the analysis queries against the temp invoice_db database.
+
+    Returns a function inserting invoices given as (shop_name, invoice_date,
+    total_amount, transaction_type, [(item_name, quantity, total_price)]).
+    """
+    # Drop the cached per-thread connection to the real database
+    monkeypatch.setattr(analysis, '_local', threading.local())
+
+    def add(invoices):
+        add_invoices([
+            {
+                'shop_name': shop_name,
+                'invoice_date': invoice_date,
+                'total_amount': amount,
+                'transaction_type': transaction_type,
+                'items': [
+                    {'item_name': item_name, 'quantity': quantity, 'total_price': total_price}
+                    for item_name, quantity, total_price in items
+                ],
+            }
+            for shop_name, invoice_date, amount, transaction_type, items in invoices
+        ])
+
+    return add
+
+@pytest.mark.parametrize('date_str, expected', [
+    ('14/10/2026', datetime(2026, 10, 14)),
+    ('14-10-2026', datetime(2026, 10, 14)),
+    ('14.10.2026', datetime(2026, 10, 14)),
+    ('2026-10-14', datetime(2026, 10, 14)),
+    ('7/10/2026', datetime(2026, 10, 7)),
+    ('14/10/26', datetime(2026, 10, 14)),
+    ('14-10-70', datetime(1970, 10, 14)),
+    (date(2026, 10, 14), datetime(2026, 10, 14)),
+    (datetime(2026, 10, 14, 9, 30), datetime(2026, 10, 14, 9, 30)),
+    ('31/02/2026', None),
+    ('October 14', None),
+    ('', None),
+    (None, None),
+])
+def test_parse_invoice_date(date_str, expected):
+    """Every supported invoice date format parses to the same datetime."""
+    assert analysis.parse_invoice_date(date_str) == expected
+
+def test_daily_buckets_merge_date_formats(analysis_db):
+    """ISO and d/m/Y dates for the same day land in one daily bucket."""
+    analysis_db([
+        ("Indomaret", '2099-10-05', 100, 'retail', []),
+        ("Alfamart", '5/10/2099', 250, 'retail', []),
+        ("Tokopedia", '2099-10-12', 400, 'e-commerce', []),
+    ])
+
+    daily = calculate_daily_totals(weeks_back=4)
+
+    assert daily['total_spent'] == 750
+    assert daily['transaction_count'] == 3
+    assert daily['days_with_data'] == 2
+    breakdown = daily['daily_breakdown']
+    assert sorted(breakdown) == ['2099-10-05', '2099-10-12']
+    assert breakdown['2099-10-05']['total'] == 350
+    assert breakdown['2099-10-05']['count'] == 2
+    assert breakdown['2099-10-12']['total'] == 400
+
+def test_weekly_buckets(analysis_db):
+    """Days are grouped into Monday-based weeks, whatever their format."""
+    analysis_db([
+        ("Indomaret", '2099-10-05', 100, 'retail', []),
+        ("Alfamart", '7/10/2099', 200, 'retail', []),
+        ("Tokopedia", '2099-10-12', 400, 'e-commerce', []),
+    ])
+
+    weekly = calculate_weekly_averages(weeks_back=4)
+
+    assert weekly['total_spent'] == 700
+    assert weekly['weeks_with_data'] == 2
+    assert weekly['weekly_average'] == 350
+    assert weekly['daily_average'] == 700 / 28
+    weeks = [week for _, week in sorted(weekly['weekly_breakdown'].items())]
+    assert [(week['total'], week['count']) for week in weeks] == [(300, 2), (400, 1)]
+
+def test_daily_trend_orders_mixed_formats_chronologically(analysis_db):
+    """A d/m/Y date sorts after ISO dates as text, but not in the trend."""
+    analysis_db([
+        ("Indomaret", '2099-10-06', 100, 'retail', []),
+        ("Indomaret", '2099-10-07', 100, 'retail', []),
+        ("Electronic City", '5/10/2099', 1000, 'retail', []),
+    ])
+
+    trend = analysis.analyze_daily_trends(weeks_back=4)
+
+    assert trend['trend'] == 'stable'
+    assert trend['trend_percentage'] == 0
+    assert [day for day, _ in trend['daily_data']] == ['2099-10-05', '2099-10-06', '2099-10-07']
+
+def test_item_spending_without_invoices(analysis_db):
+    """No invoices in the period gives the short empty result."""
+    analysis_db([
+        ("Indomaret", OLD_DATE, 100, 'retail', [("Teh Botol", 1, 100)]),
+    ])
+
+    assert analysis.analyze_item_spending(weeks_back=4) == {'top_items': [], 'total_items': 0}
+
+def test_item_spending_without_items(analysis_db):
+    """Invoices without items give an empty ranking with a unique count."""
+    analysis_db([
+        ("Indomaret", PERIOD_DATE, 100, 'retail', []),
+    ])
+
+    assert analysis.analyze_item_spending(weeks_back=4) == {'top_items': [], 'total_unique_items': 0}
+
+def test_item_spending_groups_items(analysis_db):
+    """Items are summed across invoices, counting a missing quantity as 1."""
+    analysis_db([
+        ("Indomaret", PERIOD_DATE, 30000, 'retail', [("Teh Botol", 2, 10000), ("Roti", None, 20000)]),
+        ("", PERIOD_DATE, 5000, 'retail', [("Teh Botol", 1, 5000)]),
+    ])
+
+    items = analysis.analyze_item_spending(weeks_back=4)
+
+    assert items['total_unique_items'] == 2
+    roti, teh = items['top_items']
+    assert roti['item_name'] == "Roti" and roti['quantity_bought'] == 1
+    assert teh['item_name'] == "Teh Botol"
+    assert teh['total_spent'] == 15000
+    assert teh['quantity_bought'] == 3
+    assert teh['average_price'] == 5000
+    assert sorted(teh['shops_bought_from']) == ["Indomaret", "Unknown"]
+
+def test_missing_shop_and_type_are_grouped(analysis_db):
+    """Blank shop names fall under 'Unknown' and missing types under 'unknown'."""
+    analysis_db([
+        ("", PERIOD_DATE, 100, None, []),
+        ("", PERIOD_DATE, 200, '', []),
+        ("Indomaret", PERIOD_DATE, 50, 'retail', []),
+    ])
+
+    shops = analysis.find_biggest_spending_categories(weeks_back=4)['by_shop']
+    assert [(shop['shop_name'], shop['total_amount'], shop['transaction_count']) for shop in shops] == [
+        ("Unknown", 300, 2),
+        ("Indomaret", 50, 1),
+    ]
+
+    types = analysis.analyze_transaction_types(weeks_back=4)
+    assert types['total_by_type'] == {'unknown': 300, 'retail': 50}
+    assert types['by_type'][0]['transaction_count'] == 2
+
 if __name__ == "__main__":
     test_adaptive_granularity()
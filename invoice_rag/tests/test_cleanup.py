@@ -0,0 +1,59 @@
+"""
+Tests for the conditional cleanups in cleanup.py.
+Each test builds a throwaway SQLite database so the real one is never touched.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from cleanup import clean_database, open_connection
+
+def processed_days_ago(days):
+    """A processed_at value, in UTC like CURRENT_TIMESTAMP."""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+def items(count):
+    return [{'item_name': f"item {n}", 'quantity': 1, 'unit_price': 1000, 'total_price': 1000} for n in range(count)]
+
+@pytest.fixture
+def cleanup_conn(invoice_db, add_invoices):
+    """A cleanup connection to a database holding four invoices."""
+    add_invoices([
+        {'shop_name': "Indomaret", 'total_amount': 50000, 'processed_at': processed_days_ago(10), 'items': items(2)},
+        {'shop_name': "Test Shop", 'total_amount': 20000, 'processed_at': processed_days_ago(0), 'items': items(1)},
+        {'shop_name': "Alfamart", 'total_amount': 30000, 'processed_at': processed_days_ago(0), 'items': items(3)},
+        {'shop_name': "my TEST store", 'total_amount': 15000, 'processed_at': processed_days_ago(30)},
+    ])
+    conn = open_connection(invoice_db)
+    yield conn
+    conn.close()
+
+def remaining_shops(conn):
+    return sorted(row[0] for row in conn.execute("SELECT shop_name FROM invoices"))
+
+def orphaned_items(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM invoice_items WHERE invoice_id NOT IN (SELECT id FROM invoices)"
+    ).fetchone()[0]
+
+def test_clean_old_data(cleanup_conn):
+    """Invoices processed more than 7 days ago go, together with their items."""
+    conn = cleanup_conn
+    removed = clean_database(conn, "old")
+
+    assert removed == {'invoices': 2, 'items': 2, 'spending': 65000}
+    assert remaining_shops(conn) == ["Alfamart", "Test Shop"]
+    assert conn.execute("SELECT COUNT(*) FROM invoice_items").fetchone()[0] == 4
+    assert orphaned_items(conn) == 0
+    assert not conn.in_transaction
+
+def test_clean_test_data(cleanup_conn):
+    """Shops matching 'test' in any case go, together with their items."""
+    conn = cleanup_conn
+    removed = clean_database(conn, "test")
+
+    assert removed == {'invoices': 2, 'items': 1, 'spending': 35000}
+    assert remaining_shops(conn) == ["Alfamart", "Indomaret"]
+    assert conn.execute("SELECT COUNT(*) FROM invoice_items").fetchone()[0] == 5
+    assert orphaned_items(conn) == 0
+    assert not conn.in_transaction
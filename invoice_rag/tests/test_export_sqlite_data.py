@@ -0,0 +1,56 @@
+"""
+Tests for the streamed JSON export in migration/export_sqlite_data.py.
+The streamed file must match a plain json.dumps of the whole export.
+"""
+import io
+import json
+
+import pytest
+
+from migration import export_sqlite_data
+
+EXPORT_TABLES = {
+    'invoices': [
+        {'id': 1, 'shop_name': 'Kopi Kenangan ☕', 'invoice_date': '14/10/2026', 'total_amount': 45500.5,
+         'transaction_type': None, 'processed_at': '2026-10-14 08:30:00'},
+        {'id': 2, 'shop_name': 'Toko "Serba Ada"\nCabang 2', 'invoice_date': None, 'total_amount': 0.0,
+         'transaction_type': 'bank', 'processed_at': '2026-10-15 12:00:00'},
+    ],
+    'invoice_items': [
+        {'id': 1, 'invoice_id': 1, 'item_name': 'Es Kopi Susu', 'quantity': 2, 'unit_price': 22750.25,
+         'total_price': 45500.5},
+    ],
+    'spending_limits': [],
+}
+
+def write_export(tables):
+    f = io.BytesIO()
+    for table_name, records in tables.items():
+        export_sqlite_data.write_table(f, table_name, iter(records), first=f.tell() == 0)
+    f.write(b'\n}')
+    return f.getvalue()
+
+def expected_export(tables):
+    return json.dumps(tables, indent=2, ensure_ascii=False).encode('utf-8')
+
+@pytest.mark.skipif(not export_sqlite_data.ORJSON_AVAILABLE, reason="orjson not installed")
+def test_write_table_orjson_matches_json_dumps():
+    """The orjson path writes the same bytes as json.dumps."""
+    assert write_export(EXPORT_TABLES) == expected_export(EXPORT_TABLES)
+
+def test_write_table_json_matches_json_dumps(monkeypatch):
+    """The json fallback writes the same bytes as json.dumps."""
+    monkeypatch.setattr(export_sqlite_data, 'ORJSON_AVAILABLE', False)
+    assert write_export(EXPORT_TABLES) == expected_export(EXPORT_TABLES)
+
+@pytest.mark.parametrize('orjson_available', [True, False])
+def test_write_table_empty_table(monkeypatch, orjson_available):
+    """An empty table is written as [] and reports no records."""
+    if orjson_available and not export_sqlite_data.ORJSON_AVAILABLE:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(export_sqlite_data, 'ORJSON_AVAILABLE', orjson_available)
+    f = io.BytesIO()
+    assert export_sqlite_data.write_table(f, 'spending_limits', iter(()), first=True) == 0
+    f.write(b'\n}')
+    assert f.getvalue() == expected_export({'spending_limits': []})
+    assert json.loads(f.getvalue()) == {'spending_limits': []}